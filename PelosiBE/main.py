@@ -1,6 +1,9 @@
-from fastapi import FastAPI, Body, Query, Depends, HTTPException, status
-from pydantic import BaseModel, EmailStr
-import bcrypt
+import time
+_imports_started = time.perf_counter()
+
+import asyncio
+from fastapi import FastAPI, Body, Query, Depends, HTTPException, Response, status
+from pydantic import BaseModel, EmailStr, Field
 from utils.db_io import (
     load_congresspeople,
     load_tickers,
@@ -9,18 +12,36 @@ from utils.db_io import (
     create_user,
     get_user_by_email,
     get_user_by_id,
+    update_user_password_hash,
     add_favorite_stock,
     list_favorite_stocks,
     remove_favorite_stock,
+    list_favorite_quotes,
+    add_favorite_stocks,
+    remove_favorite_stocks,
 )
-from services.stocks import get_stock_info, fetch_all_ticker_data, get_recommendation_trends, get_company_news  # Added fetch_all_ticker_data
-from utils.db import init_db
+from services.stocks import get_stock_info_cached, fetch_all_ticker_data, get_recommendation_trends, get_company_news, parse_chart_fields  # Added fetch_all_ticker_data
+from services.upstream import close_client, run_blocking
+from utils.db import PoolTimeout, init_db, pool_stats
+from utils import startup
+from utils.cache import cache_stats
+from utils.passwords import AuthOverloaded, auth_admission, check_password, hash_password
+from utils.compression import CompressionMiddleware
+from utils.slow_queries import recent_slow_queries
+from utils.metrics import CONTENT_TYPE, MetricsMiddleware, render, update_pool_gauges
+from utils.responses import FastJSONResponse, json_response
 from utils.security import check_api_security, create_access_token, get_current_user_id
 from typing import Optional
+from datetime import date
 from dotenv import load_dotenv
+import os
 import uvicorn
 
-app = FastAPI()
+startup.imports_done(_imports_started)
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+app.add_middleware(MetricsMiddleware)
 
 load_dotenv()
 
@@ -35,34 +56,136 @@ class AuthPayload(BaseModel):
 class FavoritePayload(BaseModel):
     ticker: str
 
+
+class FavoriteBatchPayload(BaseModel):
+    tickers: list[str] = Field(..., min_length=1, max_length=200)
+
+
+class StockBatchPayload(BaseModel):
+    tickers: list[str] = Field(..., min_length=1, max_length=100)
+    start: str
+    end: str
+    format: str = Field("rows", pattern="^(rows|columnar)$")
+    fields: Optional[str] = None
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request, exc):
+    # Every connection is busy: shed the request instead of piling up threads.
+    return json_response({"detail": "Database busy, retry shortly"}, status_code=503)
+
+@app.exception_handler(AuthOverloaded)
+async def auth_overloaded_handler(request, exc):
+    return FastJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
 @app.on_event("startup")
 def startup_event():
-    init_db()
+    # Serve /healthz right away; the pool, migrations and heavy modules load in the background (see /readyz).
+    startup.run_in_background([
+        ("db_init", init_db),
+        ("warm_imports", lambda: startup.warm_imports("utils.snapshot", "yfinance", "bcrypt")),
+    ])
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_client()
 
 # --- ROUTES ---
 @app.get("/")
 def root():
     return {"message": "Congress Trade Scraper API running."}
 
-@app.get("/stocks/{ticker}")
-def stock_data(ticker: str, start: str, end: str, password: Optional[str] = Query(None)):
-    check_api_security(password)
-    return get_stock_info(ticker, start, end)
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    report = startup.report()
+    return json_response(report, status_code=200 if report["ready"] else 503)
 
+# Fixed /stocks/... paths must be registered before /stocks/{ticker}, which would match them first.
 @app.get("/stocks/fetch-all")
 def fetch_all_stocks(start: str, end: str, password: Optional[str] = Query(None)):
     check_api_security(password)
-    return fetch_all_ticker_data(start, end)
+    return json_response(fetch_all_ticker_data(start, end))
+
+@app.get("/stocks/{ticker}")
+async def stock_data(
+    ticker: str,
+    start: str,
+    end: str,
+    format: str = Query("rows", pattern="^(rows|columnar)$"),
+    fields: Optional[str] = Query(None),
+    password: Optional[str] = Query(None),
+):
+    check_api_security(password)
+    try:
+        chart_fields = parse_chart_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(await run_blocking(
+        get_stock_info_cached, ticker, start, end, columnar=format == "columnar", fields=chart_fields
+    ))
+
+@app.post("/stocks/batch")
+async def stock_data_batch(payload: StockBatchPayload, password: Optional[str] = Query(None)):
+    check_api_security(password)
+    try:
+        chart_fields = parse_chart_fields(payload.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    tickers = list(dict.fromkeys(t.strip().upper() for t in payload.tickers if t.strip()))
+    responses = await asyncio.gather(*(
+        run_blocking(
+            get_stock_info_cached, ticker, payload.start, payload.end,
+            columnar=payload.format == "columnar", fields=chart_fields,
+        )
+        for ticker in tickers
+    ), return_exceptions=True)
+
+    results, errors = {}, {}
+    for ticker, response in zip(tickers, responses):
+        if isinstance(response, PoolTimeout):
+            raise response  # shed the whole request with 503, like /stocks/{ticker}
+        if isinstance(response, Exception):
+            errors[ticker] = str(response)
+        elif "error" in response:
+            errors[ticker] = response["error"]
+        else:
+            results[ticker] = response
+    return json_response({"results": results, "errors": errors})
 
 @app.get("/stocks/recommendation-trends/{ticker}")
-def recommendation_trends(ticker: str, password: Optional[str] = Query(None)):
+async def recommendation_trends(ticker: str, password: Optional[str] = Query(None)):
     check_api_security(password)
-    return get_recommendation_trends(ticker)
+    return await get_recommendation_trends(ticker)
 
 @app.get("/stocks/company-news/{ticker}")
-def company_news(ticker: str, start: str, end: str, password: Optional[str] = Query(None)):
+async def company_news(ticker: str, start: str, end: str, password: Optional[str] = Query(None)):
+    check_api_security(password)
+    return await get_company_news(ticker, start, end)
+
+@app.get("/admin/cache-stats")
+def get_cache_stats(password: Optional[str] = Query(None)):
+    check_api_security(password)
+    return cache_stats()
+
+@app.get("/metrics")
+def metrics(password: Optional[str] = Query(None)):
+    check_api_security(password)
+    update_pool_gauges(pool_stats())
+    return Response(render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/pool-stats")
+def get_pool_stats(password: Optional[str] = Query(None)):
+    check_api_security(password)
+    return pool_stats()
+
+@app.get("/admin/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=500), password: Optional[str] = Query(None)):
     check_api_security(password)
-    return get_company_news(ticker, start, end)
+    return json_response(recent_slow_queries(limit))
 
 @app.get("/congresstrades/congresspeople")
 def get_congresspeople(password: Optional[str] = Query(None)):
@@ -75,27 +198,42 @@ def get_tickers(password: Optional[str] = Query(None)):
     return load_tickers()
 
 @app.get("/congresstrades/load_existing_data")
-def get_grouped_data(password: Optional[str] = Query(None)):
+def get_grouped_data(
+    congressman_id: Optional[int] = Query(None),
+    since: Optional[date] = Query(None),
+    until: Optional[date] = Query(None),
+    transaction_type: Optional[str] = Query(None),
+    ticker_prefix: Optional[str] = Query(None, max_length=20),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    password: Optional[str] = Query(None),
+):
     check_api_security(password)
-    return load_existing_data()
+    try:
+        data = load_existing_data(
+            congressman_id=congressman_id,
+            since=since,
+            until=until,
+            transaction_type=transaction_type,
+            ticker_prefix=ticker_prefix,
+            limit=limit,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(data)
 
 @app.post("/congresstrades/find_same_politician_same_stock_type")
 def api_get_same(trades: list[dict] = Body(...), password: Optional[str] = Query(None)):
     check_api_security(password)
-    results = []
-    for t in trades:
-        res = find_same_politician_same_stock_type(
-            ticker=t.get("ticker"),
-            politician=t.get("politician")
-        )
-        results.extend(res)
-    return results
+    return json_response(find_same_politician_same_stock_type(trades))
 
 
 @app.post("/auth/register")
-def register(payload: AuthPayload):
-    password_hash = bcrypt.hashpw(payload.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-    user = create_user(payload.email, password_hash)
+async def register(payload: AuthPayload):
+    async with auth_admission():
+        password_hash = await hash_password(payload.password)
+    user = await run_blocking(create_user, payload.email, password_hash)
     if not user:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already registered")
     token = create_access_token(user["id"])
@@ -103,10 +241,17 @@ def register(payload: AuthPayload):
 
 
 @app.post("/auth/login")
-def login(payload: AuthPayload):
-    user = get_user_by_email(payload.email)
-    if not user or not bcrypt.checkpw(payload.password.encode("utf-8"), user["password_hash"].encode("utf-8")):
+async def login(payload: AuthPayload):
+    user = await run_blocking(get_user_by_email, payload.email)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    async with auth_admission():
+        matches, new_hash = await check_password(payload.password, user["password_hash"])
+    if not matches:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was stored
+        await run_blocking(update_user_password_hash, user["id"], new_hash)
     token = create_access_token(user["id"])
     return {"token": token, "user": {"id": user["id"], "email": user["email"], "created_at": user["created_at"]}}
 
@@ -120,10 +265,27 @@ def me(user_id: int = Depends(get_current_user_id)):
 
 
 @app.get("/favorites")
-def get_favorites(user_id: int = Depends(get_current_user_id)):
+def get_favorites(
+    expand: Optional[str] = Query(None, pattern="^quote$"),
+    user_id: int = Depends(get_current_user_id),
+):
+    if expand == "quote":
+        return json_response(list_favorite_quotes(user_id))
     return list_favorite_stocks(user_id)
 
 
+@app.post("/favorites/batch")
+def add_favorites_batch(payload: FavoriteBatchPayload, user_id: int = Depends(get_current_user_id)):
+    added, existing = add_favorite_stocks(user_id, payload.tickers)
+    return {"added": added, "existing": existing}
+
+
+@app.delete("/favorites/batch")
+def delete_favorites_batch(payload: FavoriteBatchPayload, user_id: int = Depends(get_current_user_id)):
+    removed, not_found = remove_favorite_stocks(user_id, payload.tickers)
+    return {"removed": removed, "not_found": not_found}
+
+
 @app.post("/favorites")
 def add_favorite(payload: FavoritePayload, user_id: int = Depends(get_current_user_id)):
     created = add_favorite_stock(user_id, payload.ticker)
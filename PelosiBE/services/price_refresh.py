@@ -0,0 +1,294 @@
+"""
+Batched price refresh for the whole ticker universe.
+
+Tickers are grouped by the date window they are missing, downloaded in
+multi-ticker yf.download batches, and written back to price_history on a
+bounded worker pool while the next batch downloads. A ticker that fails to
+download or save is reported on its own and never aborts the rest of the run.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from functools import lru_cache
+import logging
+import threading
+import time
+
+from utils.metrics import upstream_timer
+from utils.db_io import load_price_coverage_all, save_price_history
+
+FULL_HISTORY_START = date(1900, 1, 1)
+
+
+def missing_ranges(coverage, start_date, end_date):
+    # Coverage is kept contiguous, so at most one gap before and one after it.
+    if not coverage:
+        return [(start_date, end_date)]
+    ranges = []
+    if start_date < coverage["covered_start"]:
+        ranges.append((start_date, coverage["covered_start"]))
+    if end_date > coverage["covered_end"]:
+        ranges.append((coverage["covered_end"], end_date))
+    return ranges
+
+
+# An empty answer for a window this short, from every ticker in a batch, is read as
+# an unscheduled market closure (the calendar below only knows regular holidays).
+MAX_CLOSED_MARKET_DAYS = 4
+
+
+def _observed(day: date) -> date:
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based) weekday of the month; n = -1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> frozenset:
+    """Regular NYSE full-day closures (current rules; one-off closures are not included)."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),          # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),          # Washington's Birthday
+        _easter(year) - timedelta(days=2),    # Good Friday
+        _nth_weekday(year, 5, 0, -1),         # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),          # Labor Day
+        _nth_weekday(year, 11, 3, 4),         # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day on a Saturday is not observed on the Friday before.
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+def _has_trading_days(start_date, end_date) -> bool:
+    """Any NYSE trading day in [start_date, end_date)."""
+    if (end_date - start_date).days >= 14:
+        return True
+    for i in range((end_date - start_date).days):
+        day = start_date + timedelta(days=i)
+        if day.weekday() < 5 and day not in nyse_holidays(day.year):
+            return True
+    return False
+
+
+def covered_until(bars, fetch_start, fetch_end, trailing: bool = True, market_closed: bool = False):
+    """
+    End of the part of [fetch_start, fetch_end) that a download proved fetched,
+    or None if the result proves nothing.
+
+    Today's bar is still moving, so the window never extends past yesterday.
+    A leading window (before the stored range) is recorded whole: it ends where
+    coverage starts, and days before a listing legitimately have no bars. On the
+    trailing window yfinance's habit of answering a failed or rate-limited symbol
+    with an empty frame matters: coverage stops the day after the last bar, and an
+    empty answer only counts when the market was closed for the whole window,
+    per the holiday calendar or, for short windows, `market_closed` (the caller
+    saw no bars for any ticker).
+    """
+    end = max(fetch_start, min(fetch_end, date.today()))
+    if not trailing:
+        return end
+    if bars:
+        return max(fetch_start, min(end, bars[-1][0] + timedelta(days=1)))
+    if not _has_trading_days(fetch_start, end):
+        return end
+    if market_closed and (end - fetch_start).days <= MAX_CLOSED_MARKET_DAYS:
+        return end
+    return None
+
+
+def history_to_bars(history):
+    history = history.dropna(subset=["Close"])
+    return list(zip(
+        history.index.date,
+        history["Open"].tolist(),
+        history["High"].tolist(),
+        history["Low"].tolist(),
+        history["Close"].tolist(),
+        history["Volume"].fillna(0).astype("int64").tolist(),
+    ))
+
+
+class RefreshStats:
+    def __init__(self, tickers_total: int):
+        self.tickers_total = tickers_total
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bars = 0
+        self.bytes = 0  # in-memory size of the downloaded frames
+        self.batches = 0
+        self.retries = 0
+        self.errors = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record_success(self, bar_count: int):
+        with self._lock:
+            self.succeeded += 1
+            self.bars += bar_count
+
+    def record_failure(self, ticker: str, error: str):
+        with self._lock:
+            self.failed += 1
+            self.errors[ticker] = error
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self._started
+        processed = self.succeeded + self.failed
+        return {
+            "tickers_total": self.tickers_total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "bars": self.bars,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "retries": self.retries,
+            "elapsed_seconds": round(elapsed, 3),
+            "tickers_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+            "errors": dict(self.errors),
+        }
+
+
+def _download_batch(tickers, start_date, end_date, threads: int, max_retries: int, stats: RefreshStats):
+    import yfinance as yf  # heavy; only the refresh job needs it
+
+    attempt = 0
+    while True:
+        try:
+            with upstream_timer("yfinance", "download"):
+                return yf.download(
+                    tickers,
+                    start=start_date,
+                    end=end_date,
+                    group_by="ticker",
+                    auto_adjust=True,
+                    actions=False,
+                    threads=threads,
+                    progress=False,
+                )
+        except Exception:
+            if attempt >= max_retries:
+                raise
+            attempt += 1
+            stats.retries += 1
+            time.sleep(2 ** attempt)
+
+
+def _ticker_frame(data, ticker: str):
+    import pandas as pd
+
+    if data is None or data.empty:
+        return pd.DataFrame()
+    if isinstance(data.columns, pd.MultiIndex):
+        if ticker not in data.columns.get_level_values(0):
+            return pd.DataFrame()
+        return data[ticker]
+    return data
+
+
+def _has_bars(frame) -> bool:
+    return not frame.empty and frame["Close"].notna().any()
+
+
+def _store_ticker(ticker, frame, window, coverage, market_closed: bool, stats: RefreshStats):
+    fetch_start, fetch_end = window
+    try:
+        bars = history_to_bars(frame) if not frame.empty else []
+        # A brand-new ticker with no bars is more likely a bad symbol than a quiet
+        # market, so leave its window unrecorded and let the next run retry it.
+        if not bars and not coverage:
+            stats.record_failure(ticker, "No price data returned")
+            return
+        trailing = coverage is None or fetch_start >= coverage["covered_end"]
+        covered_end = covered_until(bars, fetch_start, fetch_end, trailing, market_closed)
+        if covered_end is None:
+            stats.record_failure(ticker, "No price data returned for a window with trading days")
+            return
+        save_price_history(ticker, bars, fetch_start, covered_end)
+        stats.record_success(len(bars))
+    except Exception as e:
+        stats.record_failure(ticker, str(e))
+
+
+def refresh_prices(tickers, start_date=FULL_HISTORY_START, end_date=None,
+                   batch_size: int = 50, max_workers: int = 4, max_retries: int = 2):
+    """
+    Bring price_history up to date for every ticker over [start_date, end_date).
+
+    Only the windows missing from price_history_coverage are downloaded, so after
+    the first full run a daily refresh asks yfinance for roughly one bar per ticker.
+
+    Returns:
+        RefreshStats.as_dict() with counts, throughput and per-ticker errors
+    """
+    end_date = end_date or date.today()
+    tickers = sorted({t.upper() for t in tickers if t and t != "-"})
+    stats = RefreshStats(len(tickers))
+    coverage = load_price_coverage_all()
+
+    # Group by missing window so every yf.download call shares one date range.
+    by_window = {}
+    for ticker in tickers:
+        ranges = missing_ranges(coverage.get(ticker), start_date, end_date)
+        if not ranges:
+            stats.skipped += 1
+        for window in ranges:
+            by_window.setdefault(window, []).append(ticker)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for window, window_tickers in by_window.items():
+            for i in range(0, len(window_tickers), batch_size):
+                batch = window_tickers[i:i + batch_size]
+                stats.batches += 1
+                try:
+                    data = _download_batch(batch, window[0], window[1], max_workers, max_retries, stats)
+                except Exception as e:
+                    logging.error(f"Price batch {window} failed: {e}")
+                    for ticker in batch:
+                        stats.record_failure(ticker, str(e))
+                    continue
+
+                stats.bytes += int(data.memory_usage(deep=True).sum()) if data is not None else 0
+                frames = {ticker: _ticker_frame(data, ticker) for ticker in batch}
+                # No bars for anyone (and the calendar knows no holiday): an unscheduled closure,
+                # unless the batch is a single ticker, where it proves nothing.
+                market_closed = len(frames) > 1 and not any(_has_bars(f) for f in frames.values())
+                # Writes overlap with the next download; each ticker commits on its own.
+                for ticker, frame in frames.items():
+                    pool.submit(_store_ticker, ticker, frame, window, coverage.get(ticker), market_closed, stats)
+
+    result = stats.as_dict()
+    logging.info(
+        f"Price refresh: {result['succeeded']}/{result['tickers_total']} tickers, "
+        f"{result['bars']} bars, {result['tickers_per_second']} tickers/s, {result['retries']} retries"
+    )
+    return result
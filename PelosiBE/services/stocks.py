@@ -1,109 +1,250 @@
-from datetime import datetime
-import json
+from datetime import date, datetime
 import os
-import requests
-import yfinance as yf
-from utils.db_io import load_tickers
+from utils.db_io import (
+    load_tickers,
+    get_price_coverage,
+    load_company_names,
+    load_price_coverage_all,
+    load_price_history,
+    iter_price_history,
+    save_price_history,
+)
+from utils.cache import TTLCache
+from services.upstream import upstream_get
+from utils.db import PoolTimeout
+from utils.metrics import upstream_timer
+from services.price_refresh import FULL_HISTORY_START, covered_until, history_to_bars, missing_ranges, refresh_prices
 
-def get_stock_info(ticker: str, start: str, end: str):
+# Recommendation trends move at most monthly; news for a fixed window is stable for minutes.
+recommendation_cache = TTLCache(
+    "finnhub_recommendation_trends",
+    ttl=float(os.getenv("FINNHUB_TRENDS_TTL_SECONDS", "21600")),
+    maxsize=int(os.getenv("FINNHUB_CACHE_MAXSIZE", "512")),
+)
+# Assembled /stocks/{ticker} responses; short so today's bar is picked up quickly.
+stock_info_cache = TTLCache(
+    "stock_info",
+    ttl=float(os.getenv("STOCK_INFO_TTL_SECONDS", "60")),
+    maxsize=int(os.getenv("STOCK_INFO_CACHE_MAXSIZE", "1024")),
+)
+news_cache = TTLCache(
+    "finnhub_company_news",
+    ttl=float(os.getenv("FINNHUB_NEWS_TTL_SECONDS", "300")),
+    maxsize=int(os.getenv("FINNHUB_CACHE_MAXSIZE", "512")),
+)
+
+def _fill_price_history(ticker: str, start_date: date, end_date: date):
+    """Fetch only the parts of [start_date, end_date) not yet stored and return the company name."""
+    coverage = get_price_coverage(ticker)
+    company_name = coverage["company_name"] if coverage else None
+    missing = missing_ranges(coverage, start_date, end_date)
+    if not missing and company_name:
+        return company_name
+
+    import yfinance as yf  # heavy (pulls in pandas/numpy); loaded on first use
+
+    stock = yf.Ticker(ticker)
+    if not company_name:
+        with upstream_timer("yfinance", "info"):
+            company_name = stock.info.get("longName", "N/A")
+
+    for fetch_start, fetch_end in missing:
+        with upstream_timer("yfinance", "history"):
+            history = stock.history(start=fetch_start, end=fetch_end)
+        bars = history_to_bars(history)
+        # An empty answer for a ticker we have never stored may be a bad symbol or a
+        # transient failure, so only remember the window once the ticker is known.
+        if not bars and not coverage:
+            continue
+        # history() also answers errors with an empty frame; leave an unproven trailing
+        # window for the next request. A leading window ends where coverage starts and
+        # may predate the listing, so it is recorded whole (see covered_until).
+        trailing = coverage is None or fetch_start >= coverage["covered_end"]
+        covered_end = covered_until(bars, fetch_start, fetch_end, trailing)
+        if covered_end is None:
+            continue
+        save_price_history(ticker, bars, fetch_start, covered_end, company_name)
+        coverage = coverage or {"covered_start": fetch_start, "covered_end": covered_end}
+
+    if not missing:
+        save_price_history(ticker, [], coverage["covered_start"], coverage["covered_end"], company_name)
+    return company_name
+
+
+CHART_FIELDS = ("open", "high", "low", "volume")
+# Written by fetch_all_ticker_data; /stocks/{ticker} serves windows it covers
+# straight from the mapped file. Set to an empty value to always use the database.
+STOCK_SNAPSHOT_PATH = os.getenv("STOCK_SNAPSHOT_PATH", "data/stock_snapshot.bin")
+
+
+def parse_chart_fields(fields: str = None):
+    """Split a comma separated ?fields= value into the optional columnar arrays."""
+    if not fields:
+        return ()
+    requested = tuple(f.strip().lower() for f in fields.split(",") if f.strip())
+    unknown = [f for f in requested if f not in CHART_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown chart fields: {', '.join(unknown)}")
+    return requested
+
+
+def chart_from_columns(columns, columnar: bool = False, fields=()):
+    """
+    Build the chart payload from {column: ndarray} bars with whole-column operations.
+
+    Returns:
+        (chart, close) where chart is either a list of {"date", "close"} rows or,
+        when columnar, {"dates": [...], "close": [...]} plus any requested fields,
+        and close is the rounded closing prices as a NumPy array
+    """
+    import numpy as np
+
+    dates = np.datetime_as_string(columns["date"], unit="D").tolist()
+    close = columns["close"].round(2)
+
+    if not columnar:
+        return [{"date": d, "close": c} for d, c in zip(dates, close.tolist())], close
+
+    chart = {"dates": dates, "close": close.tolist()}
+    for field in fields:
+        if field == "volume":
+            chart[field] = columns[field].tolist()
+        else:
+            chart[field] = columns[field].round(2).tolist()
+    return chart, close
+
+
+def build_chart(bars, columnar: bool = False, fields=()):
+    """Same as chart_from_columns, for (date, open, high, low, close, volume) rows from the database."""
+    from utils.snapshot import bars_to_columns
+
+    return chart_from_columns(bars_to_columns(bars), columnar, fields)
+
+
+def price_summary(close):
+    if len(close) >= 2:
+        first, last = float(close[0]), float(close[-1])
+        change = round(last - first, 2)
+        percent = round((change / first) * 100, 2) if first else 0
+    else:
+        change = percent = 0.0
+
+    return {
+        "first_price": float(close[0]) if len(close) else None,
+        "last_price": float(close[-1]) if len(close) else None,
+        "change": change,
+        "percent_change": percent,
+    }
+
+
+def _from_snapshot(ticker: str, start_date: date, end_date: date, columnar: bool, fields):
+    """The /stocks/{ticker} payload from the snapshot, or None if it does not cover the request."""
+    from utils.snapshot import load_snapshot
+
+    snapshot = load_snapshot(STOCK_SNAPSHOT_PATH) if STOCK_SNAPSHOT_PATH else None
+    # Only inside the ticker's coverage at build time; a failed or partial refresh
+    # leaves the rest to _fill_price_history as before.
+    if snapshot is None or ticker not in snapshot or not snapshot.covers(ticker, start_date, end_date):
+        return None
+    # Without a stored name the database path looks it up; don't answer "N/A" instead.
+    if not snapshot.company_name(ticker):
+        return None
+    chart, close = chart_from_columns(snapshot.history(ticker, start_date, end_date), columnar, fields)
+    return {
+        "ticker": ticker,
+        "company_name": snapshot.company_name(ticker),
+        **price_summary(close),
+        "chart": chart,
+    }
+
+
+def get_stock_info(ticker: str, start: str, end: str, columnar: bool = False, fields=()):
     try:
-        start_date = datetime.strptime(start, "%Y-%m-%d")
-        end_date = datetime.strptime(end, "%Y-%m-%d")
+        start_date = datetime.strptime(start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
         if start_date >= end_date:
             return {"error": "Start date must be before end date."}
 
-        stock = yf.Ticker(ticker.upper())
-        info = stock.info
-        company_name = info.get("longName", "N/A")
-        history = stock.history(start=start_date, end=end_date)
+        ticker = ticker.upper()
+        cached = _from_snapshot(ticker, start_date, end_date, columnar, fields)
+        if cached is not None:
+            return cached
 
-        chart = [
-            {"date": idx.strftime("%Y-%m-%d"), "close": round(row["Close"], 2)}
-            for idx, row in history.iterrows()
-        ]
-
-        if len(chart) >= 2:
-            first, last = chart[0]["close"], chart[-1]["close"]
-            change = round(last - first, 2)
-            percent = round((change / first) * 100, 2) if first else 0
-        else:
-            change = percent = 0.0
+        company_name = _fill_price_history(ticker, start_date, end_date)
+        bars = load_price_history(ticker, start_date, end_date)
+        chart, close = build_chart(bars, columnar, fields)
 
         return {
-            "ticker": ticker.upper(),
+            "ticker": ticker,
             "company_name": company_name,
-            "first_price": chart[0]["close"] if chart else None,
-            "last_price": chart[-1]["close"] if chart else None,
-            "change": change,
-            "percent_change": percent,
+            **price_summary(close),
             "chart": chart,
         }
 
+    except PoolTimeout:
+        raise  # answered with 503 by the app's handler, not as a 200 error payload
     except Exception as e:
         return {"error": str(e)}
 
-def fetch_all_ticker_data(start: str = None, end: str = None, output_path="data/stock_data.json"):
+def get_stock_info_cached(ticker: str, start: str, end: str, columnar: bool = False, fields=()):
+    key = (ticker.strip().upper(), start, end, columnar, tuple(fields))
+    return stock_info_cache.get_or_load(
+        key, lambda: get_stock_info(ticker, start, end, columnar, fields), should_cache=_is_cacheable
+    )
+
+def fetch_all_ticker_data(start: str = None, end: str = None, output_path: str = None):
+    """Refresh every ticker's prices, then rewrite the columnar snapshot (see utils/snapshot.py)."""
     try:
+        from utils.snapshot import write_snapshot
+
+        output_path = output_path or STOCK_SNAPSHOT_PATH or "data/stock_snapshot.bin"
         if start is None or end is None:
             end = datetime.today().strftime("%Y-%m-%d")
-            start = "1900-01-01"  # string format
+            start = FULL_HISTORY_START.strftime("%Y-%m-%d")
 
         # now safe to parse these strings:
-        start_date = datetime.strptime(start, "%Y-%m-%d")
-        end_date = datetime.strptime(end, "%Y-%m-%d")
+        start_date = datetime.strptime(start, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end, "%Y-%m-%d").date()
         if start_date >= end_date:
             raise ValueError("Start date must be before end date.")
 
         tickers = load_tickers()
-        result = {}
-
-        for ticker in tickers:
-            stock = yf.Ticker(ticker.upper())
-            info = stock.info
-            company_name = info.get("longName", "N/A")
-            history = stock.history(start=start_date, end=end_date)
-
-            chart = [
-                {"date": idx.strftime("%Y-%m-%d"), "close": round(row["Close"], 2)}
-                for idx, row in history.iterrows()
-            ]
-
-            if len(chart) >= 2:
-                first, last = chart[0]["close"], chart[-1]["close"]
-                change = round(last - first, 2)
-                percent = round((change / first) * 100, 2) if first else 0
-            else:
-                change = percent = 0.0
-
-            result[ticker.upper()] = {
-                "company_name": company_name,
-                "first_price": chart[0]["close"] if chart else None,
-                "last_price": chart[-1]["close"] if chart else None,
-                "change": change,
-                "percent_change": percent,
-                "chart": chart,
-            }
-
-        # Save to JSON
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w") as f:
-            json.dump(result, f, indent=2)
-
-        return {"message": "Stock data fetched and saved.", "count": len(result)}
+        stats = refresh_prices(tickers, start_date, end_date)
 
+        # Streamed one ticker at a time; only the compact arrays are kept while writing.
+        histories = iter_price_history(tickers, start_date, end_date)
+        coverage = {t: (c["covered_start"], c["covered_end"]) for t, c in load_price_coverage_all().items()}
+        written = write_snapshot(
+            output_path, histories, load_company_names(), start_date, end_date, coverage=coverage
+        )
+
+        return {
+            "message": "Stock data fetched and saved.",
+            "count": written["tickers"],
+            "rows": written["rows"],
+            "bytes": written["bytes"],
+            "path": written["path"],
+            "stats": stats,
+        }
+
+    except PoolTimeout:
+        raise  # answered with 503 by the app's handler, not as a 200 error payload
     except Exception as e:
         return {"error": str(e)}
 
 
-def get_recommendation_trends(ticker: str):
+def _is_cacheable(result):
+    return not (isinstance(result, dict) and "error" in result)
+
+
+async def _fetch_recommendation_trends(ticker: str):
     try:
         api_key = os.getenv("FINNHUB_API_KEY")
         if not api_key:
             return {"error": "FINNHUB_API_KEY not set"}
 
-        url = "https://finnhub.io/api/v1/stock/recommendation"
-        resp = requests.get(url, params={"symbol": ticker.upper(), "token": api_key}, timeout=15)
-        if not resp.ok:
+        resp = await upstream_get("/stock/recommendation", {"symbol": ticker, "token": api_key})
+        if not resp.is_success:
             return {"error": f"Finnhub request failed: {resp.status_code}", "detail": resp.text}
 
         content_type = resp.headers.get("Content-Type", "")
@@ -116,22 +257,36 @@ def get_recommendation_trends(ticker: str):
         return {"error": str(e)}
 
 
-def get_company_news(ticker: str, start: str, end: str):
+async def _fetch_company_news(ticker: str, start: str, end: str):
     try:
         api_key = os.getenv("FINNHUB_API_KEY")
         if not api_key:
             return {"error": "FINNHUB_API_KEY not set"}
 
-        url = "https://finnhub.io/api/v1/company-news"
-        resp = requests.get(
-            url,
-            params={"symbol": ticker.upper(), "from": start, "to": end, "token": api_key},
-            timeout=15,
+        resp = await upstream_get(
+            "/company-news",
+            {"symbol": ticker, "from": start, "to": end, "token": api_key},
         )
-        if not resp.ok:
+        if not resp.is_success:
             return {"error": f"Finnhub request failed: {resp.status_code}", "detail": resp.text}
 
         return resp.json()
 
     except Exception as e:
         return {"error": str(e)}
+
+
+async def get_recommendation_trends(ticker: str):
+    ticker = ticker.strip().upper()
+    return await recommendation_cache.aget_or_load(
+        ticker, lambda: _fetch_recommendation_trends(ticker), should_cache=_is_cacheable
+    )
+
+
+async def get_company_news(ticker: str, start: str, end: str):
+    ticker, start, end = ticker.strip().upper(), start.strip(), end.strip()
+    return await news_cache.aget_or_load(
+        (ticker, start, end),
+        lambda: _fetch_company_news(ticker, start, end),
+        should_cache=_is_cacheable,
+    )
@@ -0,0 +1,68 @@
+"""
+Shared upstream access for async routes.
+
+One pooled httpx.AsyncClient serves every Finnhub call so connections (and their
+TLS sessions) are kept alive between requests, and a semaphore caps how many
+upstream calls are in flight at once. Blocking yfinance/DB work is pushed to
+worker threads through a dedicated limiter so it cannot starve the event loop or
+Starlette's shared threadpool.
+"""
+import asyncio
+import functools
+import os
+
+import anyio
+import httpx
+
+from utils.metrics import UPSTREAM_ERRORS, upstream_timer
+
+FINNHUB_BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1")
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "10"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "16"))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "15"))
+BLOCKING_MAX_THREADS = int(os.getenv("BLOCKING_MAX_THREADS", "16"))
+
+_client = None
+_upstream_slots = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+_blocking_limiter = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=FINNHUB_BASE_URL,
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=60,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def upstream_get(path: str, params: dict) -> httpx.Response:
+    async with _upstream_slots:
+        with upstream_timer("finnhub", path):
+            resp = await get_client().get(path, params=params)
+    if resp.is_error:
+        UPSTREAM_ERRORS.inc(("finnhub", path))
+    return resp
+
+
+async def run_blocking(func, *args, **kwargs):
+    global _blocking_limiter
+    if _blocking_limiter is None:
+        _blocking_limiter = anyio.CapacityLimiter(BLOCKING_MAX_THREADS)
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs), limiter=_blocking_limiter
+    )
@@ -0,0 +1,150 @@
+"""
+In-process TTL + LRU cache with single-flight loading.
+"""
+import asyncio
+from collections import OrderedDict
+import threading
+import time
+
+_caches = {}
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Least-recently-used cache whose entries expire after `ttl` seconds.
+
+    Concurrent misses for the same key are coalesced: the first caller runs the
+    loader while the others wait for its result instead of calling upstream too.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._ainflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def _get_fresh(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, should_cache=lambda value: True):
+        with self._lock:
+            found, value = self._get_fresh(key)
+            if found:
+                self.hits += 1
+                return value
+            call = self._inflight.get(key)
+            if call is None:
+                self.misses += 1
+                call = self._inflight[key] = _InFlight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+            if should_cache(call.value):
+                self.set(key, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    async def _aload(self, key, loader, should_cache):
+        try:
+            value = await loader()
+            if should_cache(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+    async def aget_or_load(self, key, loader, should_cache=lambda value: True):
+        """
+        Async twin of get_or_load; `loader` is a zero-argument coroutine function.
+
+        The load runs in its own task that every caller awaits through a shield,
+        so a caller that is cancelled (client disconnected) leaves it running for
+        the others instead of failing them all.
+        """
+        with self._lock:
+            found, value = self._get_fresh(key)
+            if found:
+                self.hits += 1
+                return value
+            task = self._ainflight.get(key)
+            if task is None:
+                self.misses += 1
+                task = self._ainflight[key] = asyncio.get_running_loop().create_task(
+                    self._aload(key, loader, should_cache)
+                )
+                # Mark the error retrieved when every caller has gone away.
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "ttl_seconds": self.ttl,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def cache_stats():
+    return {name: cache.stats() for name, cache in _caches.items()}
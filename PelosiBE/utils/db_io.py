@@ -1,9 +1,11 @@
+import base64
 import json
 import logging
 from datetime import datetime
 import psycopg2
-from psycopg2.extras import Json 
-from .db import get_db_connection, release_db_connection
+from psycopg2.extras import Json, execute_values
+from .db import db_connection
+from .metrics import db_timed
 
 def parse_date(date_str):
     try:
@@ -12,105 +14,202 @@ def parse_date(date_str):
     except:
         return None
 
+@db_timed
 def load_congresspeople():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT id, name FROM congressmen ORDER BY name;")
-    results = [(r[0], r[1]) for r in cur.fetchall()]
-    cur.close()
-    release_db_connection(conn)
-    return results
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT id, name FROM congressmen ORDER BY name;")
+            return [(r[0], r[1]) for r in cur.fetchall()]
 
+@db_timed
 def load_tickers():
     print("Loading tickers from DB...")
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT ticker FROM stocks ORDER BY ticker;")
-    results = [r[0] for r in cur.fetchall()]
-    cur.close()
-    release_db_connection(conn)
-    return results
-
-def find_same_politician_same_stock_type(ticker=None, politician=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # This SQL finds entries where the politician and stock type (from raw text) match
-    # It replaces that complex triple-nested loop you had
-    query = """
-        SELECT t1.purchase_date, t1.politician, t1.raw_ticker_text, t1.raw_politician_text, t2.raw_ticker_text
-        FROM trades t1
-        JOIN trades t2 ON t1.politician = t2.politician 
-            AND right(t1.raw_ticker_text, 2) = right(t2.raw_ticker_text, 2)
-            AND t1.id < t2.id
-        WHERE 1=1
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT ticker FROM stocks ORDER BY ticker;")
+            return [r[0] for r in cur.fetchall()]
+
+@db_timed
+def find_same_politician_same_stock_type(pairs):
+    """
+    Repeat trades by the same politician in the same stock and transaction type.
+
+    Every (ticker, politician) pair is matched in one set-based query: the pairs
+    are sent as two arrays, the politician is a case-insensitive substring of
+    congressmen.name, and each result carries the pair it answers. Pairs with
+    neither a ticker nor a politician are ignored rather than matching everything.
+
+    Args:
+        pairs: iterable of {"ticker": ..., "politician": ...} dicts
+
+    Returns:
+        [{"date", "politician", "ticker", "match": (first_date, politician, ticker,
+          transaction_type, repeat_date)}] grouped in request order
     """
-    params = []
-    if ticker:
-        query += " AND t1.ticker = %s"
-        params.append(ticker.upper())
-    if politician:
-        query += " AND t1.politician ILIKE %s"
-        params.append(f"%{politician}%")
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    cur.close()
-    release_db_connection(conn)
-    
-    return [{"date": r[0], "politician": r[1], "match": r} for r in rows]
-
-def load_existing_data():
-    conn = get_db_connection()
+    tickers, politicians = [], []
+    for pair in pairs:
+        ticker = (pair.get("ticker") or "").strip().upper()
+        politician = (pair.get("politician") or "").strip()
+        if ticker or politician:
+            tickers.append(ticker or None)
+            politicians.append(politician or None)
+    if not tickers:
+        return []
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH req AS (
+                    SELECT ord, ticker, politician
+                    FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS r(ticker, politician, ord)
+                ),
+                matched AS (
+                    SELECT DISTINCT req.ord, c.id AS congressman_id, c.name, s.id AS stock_id, s.ticker
+                    FROM req
+                    JOIN congressmen c
+                        ON req.politician IS NULL OR c.name ILIKE '%%' || req.politician || '%%'
+                    JOIN stocks s
+                        ON req.ticker IS NULL OR s.ticker = req.ticker
+                )
+                SELECT t1.transaction_date, m.name, m.ticker, t1.transaction_type, t2.transaction_date
+                FROM matched m
+                JOIN transactions t1
+                    ON t1.stock_id = m.stock_id AND t1.congressman_id = m.congressman_id
+                JOIN transactions t2
+                    ON t2.stock_id = t1.stock_id
+                    AND t2.congressman_id = t1.congressman_id
+                    AND t2.transaction_type = t1.transaction_type
+                    AND t1.id < t2.id
+                ORDER BY m.ord, t1.transaction_date, t2.transaction_date;
+                """,
+                (tickers, politicians),
+            )
+            rows = cur.fetchall()
+            return [{"date": r[0], "politician": r[1], "ticker": r[2], "match": r} for r in rows]
+
+def encode_cursor(transaction_date, transaction_id) -> str:
+    raw = json.dumps([transaction_date.isoformat(), transaction_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
     try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, transaction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.strptime(date_str, "%Y-%m-%d").date(), int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+@db_timed
+def load_existing_data(
+    congressman_id=None,
+    since=None,
+    until=None,
+    transaction_type=None,
+    ticker_prefix=None,
+    limit=None,
+    cursor=None,
+):
+    """
+    Latest transaction per (stock, congressman), as
+    (ticker, congressman, transaction_date, transaction_type, ticker_name, return_pct)
+    where return_pct is the precomputed % change in price since the trade.
+
+    Without any argument this is the full list the app has always received,
+    including stocks with no transaction yet. Any filter narrows it to traded
+    stocks, and `limit` switches to keyset pages ordered by (transaction_date, id):
+    {"rows": [...], "next_cursor": <opaque string or None>}.
+    """
+    filtered = any(v is not None for v in (congressman_id, since, until, transaction_type, ticker_prefix, limit, cursor))
+    with db_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
+            if not filtered:
+                cur.execute("""
+                    SELECT
+                        s.ticker, c.name, t.transaction_date, t.transaction_type, s.name as ticker_name,
+                        r.return_pct
+                    FROM stocks s
+                    LEFT JOIN latest_transactions t ON t.stock_id = s.id
+                    LEFT JOIN congressmen c ON c.id = t.congressman_id
+                    LEFT JOIN transaction_returns r ON r.transaction_id = t.id
+                    WHERE s.ticker != '-'
+                    ORDER BY t.transaction_date;
+                """)
+                return cur.fetchall()
+
+            query = """
                 SELECT
-                    s.ticker, c.name, t.transaction_date, t.transaction_type, s.name as ticker_name
-                FROM stocks s
-                LEFT JOIN (
-                    SELECT *,
-                        ROW_NUMBER() OVER (
-                            PARTITION BY stock_id, congressman_id
-                            ORDER BY transaction_date DESC
-                        ) AS rn
-                    FROM transactions
-                ) t ON t.stock_id = s.id AND t.rn = 1
+                    s.ticker, c.name, t.transaction_date, t.transaction_type, s.name as ticker_name,
+                    r.return_pct, t.id
+                FROM latest_transactions t
+                JOIN stocks s ON s.id = t.stock_id
                 LEFT JOIN congressmen c ON c.id = t.congressman_id
-                WHere s.ticker != '-'
-                ORDER BY t.transaction_date;
-            """)
+                LEFT JOIN transaction_returns r ON r.transaction_id = t.id
+                WHERE s.ticker != '-' AND t.transaction_date IS NOT NULL
+            """
+            params = []
+            if congressman_id is not None:
+                query += " AND t.congressman_id = %s"
+                params.append(congressman_id)
+            if since is not None:
+                query += " AND t.transaction_date >= %s"
+                params.append(since)
+            if until is not None:
+                query += " AND t.transaction_date <= %s"
+                params.append(until)
+            if transaction_type:
+                query += " AND t.transaction_type ILIKE %s"
+                params.append(transaction_type.replace("%", r"\%").replace("_", r"\_") + "%")
+            if ticker_prefix:
+                query += " AND s.ticker LIKE %s"
+                params.append(ticker_prefix.upper().replace("%", r"\%").replace("_", r"\_") + "%")
+            if cursor:
+                query += " AND (t.transaction_date, t.id) > (%s, %s)"
+                params.extend(decode_cursor(cursor))
+            query += " ORDER BY t.transaction_date, t.id"
+            if limit is not None:
+                # One extra row tells us whether another page exists.
+                query += " LIMIT %s"
+                params.append(limit + 1)
+
+            cur.execute(query, params)
             rows = cur.fetchall()
-            return rows
-    finally:
-        release_db_connection(conn)
+            if limit is None:
+                return [r[:6] for r in rows]
 
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1][2], rows[-1][6])
+            return {"rows": [r[:6] for r in rows], "next_cursor": next_cursor}
 
+
+@db_timed
 def create_user(email: str, password_hash: str):
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO users (email, password_hash)
-                VALUES (%s, %s)
-                RETURNING id, email, created_at;
-                """,
-                (email.lower(), password_hash),
-            )
-            row = cur.fetchone()
-            conn.commit()
-            return {"id": row[0], "email": row[1], "created_at": row[2]}
-    except psycopg2.errors.UniqueViolation:
-        conn.rollback()
-        return None
-    finally:
-        release_db_connection(conn)
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO users (email, password_hash)
+                    VALUES (%s, %s)
+                    RETURNING id, email, created_at;
+                    """,
+                    (email.lower(), password_hash),
+                )
+                row = cur.fetchone()
+                conn.commit()
+                return {"id": row[0], "email": row[1], "created_at": row[2]}
+        except psycopg2.errors.UniqueViolation:
+            conn.rollback()
+            return None
 
 
+@db_timed
 def get_user_by_email(email: str):
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -124,13 +223,11 @@ def get_user_by_email(email: str):
             if not row:
                 return None
             return {"id": row[0], "email": row[1], "password_hash": row[2], "created_at": row[3]}
-    finally:
-        release_db_connection(conn)
 
 
+@db_timed
 def get_user_by_id(user_id: int):
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -144,13 +241,20 @@ def get_user_by_id(user_id: int):
             if not row:
                 return None
             return {"id": row[0], "email": row[1], "created_at": row[2]}
-    finally:
-        release_db_connection(conn)
 
 
+@db_timed
+def update_user_password_hash(user_id: int, password_hash: str):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE users SET password_hash = %s WHERE id = %s;", (password_hash, user_id))
+            conn.commit()
+            return cur.rowcount == 1
+
+
+@db_timed
 def add_favorite_stock(user_id: int, ticker: str):
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -166,13 +270,11 @@ def add_favorite_stock(user_id: int, ticker: str):
             if not row:
                 return None
             return {"id": row[0], "user_id": row[1], "ticker": row[2], "created_at": row[3]}
-    finally:
-        release_db_connection(conn)
 
 
+@db_timed
 def list_favorite_stocks(user_id: int):
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -185,13 +287,112 @@ def list_favorite_stocks(user_id: int):
             )
             rows = cur.fetchall()
             return [{"ticker": r[0], "created_at": r[1]} for r in rows]
-    finally:
-        release_db_connection(conn)
 
 
+@db_timed
+def list_favorite_quotes(user_id: int):
+    """
+    Favorites with their latest stored close, the change since the previous
+    close and the change since the day each was favorited, from price_history.
+    Quote fields are None for tickers without stored prices.
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT f.ticker, f.created_at, s.company_name,
+                       latest.date, latest.close, prev.close, fav.close
+                FROM favorite_stocks f
+                LEFT JOIN stocks s ON s.ticker = f.ticker
+                LEFT JOIN LATERAL (
+                    SELECT date, close FROM price_history
+                    WHERE ticker = f.ticker
+                    ORDER BY date DESC LIMIT 1
+                ) latest ON TRUE
+                LEFT JOIN LATERAL (
+                    SELECT close FROM price_history
+                    WHERE ticker = f.ticker AND date < latest.date
+                    ORDER BY date DESC LIMIT 1
+                ) prev ON TRUE
+                LEFT JOIN LATERAL (
+                    SELECT close FROM price_history
+                    WHERE ticker = f.ticker AND date <= f.created_at::date
+                    ORDER BY date DESC LIMIT 1
+                ) fav ON TRUE
+                WHERE f.user_id = %s
+                ORDER BY f.created_at DESC;
+                """,
+                (user_id,),
+            )
+            rows = cur.fetchall()
+
+    def pct(now, then):
+        if now is None or not then:
+            return None
+        return round((now / then - 1) * 100, 2)
+
+    return [
+        {
+            "ticker": r[0],
+            "created_at": r[1],
+            "company_name": r[2],
+            "price_date": r[3],
+            "price": r[4],
+            "day_change": round(r[4] - r[5], 4) if r[4] is not None and r[5] is not None else None,
+            "day_change_pct": pct(r[4], r[5]),
+            "price_when_favorited": r[6],
+            "change_since_favorited_pct": pct(r[4], r[6]),
+        }
+        for r in rows
+    ]
+
+
+@db_timed
+def add_favorite_stocks(user_id: int, tickers: list[str]):
+    """Returns (added, already_present) ticker lists."""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    if not tickers:
+        return [], []
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO favorite_stocks (user_id, ticker)
+                SELECT %s, t FROM unnest(%s::text[]) AS t
+                ON CONFLICT (user_id, ticker) DO NOTHING
+                RETURNING ticker;
+                """,
+                (user_id, tickers),
+            )
+            added = {r[0] for r in cur.fetchall()}
+            conn.commit()
+    return [t for t in tickers if t in added], [t for t in tickers if t not in added]
+
+
+@db_timed
+def remove_favorite_stocks(user_id: int, tickers: list[str]):
+    """Returns (removed, not_found) ticker lists."""
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    if not tickers:
+        return [], []
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                DELETE FROM favorite_stocks
+                WHERE user_id = %s AND ticker = ANY(%s)
+                RETURNING ticker;
+                """,
+                (user_id, tickers),
+            )
+            removed = {r[0] for r in cur.fetchall()}
+            conn.commit()
+    return [t for t in tickers if t in removed], [t for t in tickers if t not in removed]
+
+
+@db_timed
 def remove_favorite_stock(user_id: int, ticker: str) -> bool:
-    conn = get_db_connection()
-    try:
+    with db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -203,8 +404,144 @@ def remove_favorite_stock(user_id: int, ticker: str) -> bool:
             deleted = cur.rowcount > 0
             conn.commit()
             return deleted
-    finally:
-        release_db_connection(conn)
 
 
+@db_timed
+def get_price_coverage(ticker: str):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT company_name, covered_start, covered_end
+                FROM price_history_coverage
+                WHERE ticker = %s;
+                """,
+                (ticker.upper(),),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            return {"company_name": row[0], "covered_start": row[1], "covered_end": row[2]}
+
+
+@db_timed
+def load_price_coverage_all():
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT ticker, company_name, covered_start, covered_end FROM price_history_coverage;")
+            return {
+                r[0]: {"company_name": r[1], "covered_start": r[2], "covered_end": r[3]}
+                for r in cur.fetchall()
+            }
 
+
+@db_timed
+def load_price_history(ticker: str, start, end):
+    """Return stored (date, open, high, low, close, volume) bars with start <= date < end."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT date, open, high, low, close, volume
+                FROM price_history
+                WHERE ticker = %s AND date >= %s AND date < %s
+                ORDER BY date;
+                """,
+                (ticker.upper(), start, end),
+            )
+            return cur.fetchall()
+
+
+@db_timed
+def iter_price_history(tickers, start, end, itersize: int = 20000):
+    """
+    Yield (ticker, [(date, open, high, low, close, volume), ...]) one ticker at a time.
+
+    Rows come through a server-side cursor in batches of `itersize`, so only the
+    ticker being assembled is held in memory, however long the full history is.
+    """
+    with db_connection() as conn:
+        with conn.cursor(name="iter_price_history") as cur:
+            cur.itersize = itersize
+            cur.execute(
+                """
+                SELECT ticker, date, open, high, low, close, volume
+                FROM price_history
+                WHERE ticker = ANY(%s) AND date >= %s AND date < %s
+                ORDER BY ticker, date;
+                """,
+                ([t.upper() for t in tickers], start, end),
+            )
+            ticker, bars = None, []
+            for row in cur:
+                if row[0] != ticker:
+                    if bars:
+                        yield ticker, bars
+                    ticker, bars = row[0], []
+                bars.append(row[1:])
+            if bars:
+                yield ticker, bars
+        conn.rollback()
+
+
+@db_timed
+def load_company_names():
+    """{ticker: long name} from the price store, else the name scraped with the trades."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT s.ticker, COALESCE(NULLIF(c.company_name, 'N/A'), NULLIF(s.company_name, ''), s.name)
+                FROM stocks s
+                LEFT JOIN price_history_coverage c ON c.ticker = s.ticker;
+                """
+            )
+            return {r[0]: r[1] for r in cur.fetchall() if r[1]}
+
+
+@db_timed
+def save_price_history(ticker: str, bars, covered_start, covered_end, company_name=None):
+    """
+    Upsert daily bars for a ticker and widen its fetched range in a single transaction.
+
+    Args:
+        bars: iterable of (date, open, high, low, close, volume) tuples
+        covered_start, covered_end: the [start, end) window now known to be fetched
+        company_name: long name to remember so later reads skip the yfinance .info call
+    """
+    ticker = ticker.upper()
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                if bars:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO price_history (ticker, date, open, high, low, close, volume)
+                        VALUES %s
+                        ON CONFLICT (ticker, date) DO UPDATE SET
+                            open = EXCLUDED.open,
+                            high = EXCLUDED.high,
+                            low = EXCLUDED.low,
+                            close = EXCLUDED.close,
+                            volume = EXCLUDED.volume;
+                        """,
+                        [(ticker, *bar) for bar in bars],
+                        page_size=1000,
+                    )
+                cur.execute(
+                    """
+                    INSERT INTO price_history_coverage (ticker, company_name, covered_start, covered_end)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (ticker) DO UPDATE SET
+                        company_name = COALESCE(EXCLUDED.company_name, price_history_coverage.company_name),
+                        covered_start = LEAST(price_history_coverage.covered_start, EXCLUDED.covered_start),
+                        covered_end = GREATEST(price_history_coverage.covered_end, EXCLUDED.covered_end),
+                        updated_at = CURRENT_TIMESTAMP;
+                    """,
+                    (ticker, company_name, covered_start, covered_end),
+                )
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,268 @@
+"""
+Versioned schema migrations shared by PelosiBE and PelosiDB.
+
+Both services run migrate() on startup against the same database, so this file
+must stay identical in both trees. Migrations are append-only: never edit one
+that has shipped, add a new version instead.
+"""
+import logging
+
+# Arbitrary constant so the two services never run migrations at the same time.
+MIGRATION_LOCK_ID = 7_231_905
+
+MIGRATIONS = [
+    (1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS trades_raw (
+            id SERIAL PRIMARY KEY,
+            raw_content JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS congressmen (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) UNIQUE NOT NULL,
+            chamber VARCHAR(50),
+            party VARCHAR(10)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stocks (
+            id SERIAL PRIMARY KEY,
+            ticker VARCHAR(100) UNIQUE NOT NULL,
+            name VARCHAR(100) UNIQUE NOT NULL,
+            company_name TEXT
+        );
+        """,
+        # Databases first created by PelosiDB's old init_db have no stocks.name
+        "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS name VARCHAR(100);",
+        """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id SERIAL PRIMARY KEY,
+            congressman_id INTEGER REFERENCES congressmen(id),
+            stock_id INTEGER REFERENCES stocks(id),
+            transaction_type VARCHAR(20), -- Purchase/Sale
+            transaction_date DATE,
+            amount_range VARCHAR(100),
+            UNIQUE(congressman_id, stock_id, transaction_date, amount_range, transaction_type)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS favorite_stocks (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+            ticker VARCHAR(20) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, ticker)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS price_history (
+            ticker VARCHAR(20) NOT NULL,
+            date DATE NOT NULL,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            volume BIGINT,
+            PRIMARY KEY (ticker, date)
+        );
+        """,
+        # Date range already fetched from yfinance per ticker, [covered_start, covered_end)
+        """
+        CREATE TABLE IF NOT EXISTS price_history_coverage (
+            ticker VARCHAR(20) PRIMARY KEY,
+            company_name TEXT,
+            covered_start DATE NOT NULL,
+            covered_end DATE NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        # Latest transaction per (stock, congressman), refreshed after each ingest
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS latest_transactions AS
+        SELECT DISTINCT ON (stock_id, congressman_id)
+            id, stock_id, congressman_id, transaction_type, transaction_date, amount_range
+        FROM transactions
+        ORDER BY stock_id, congressman_id, transaction_date DESC, id DESC;
+        """,
+        # REFRESH ... CONCURRENTLY needs a unique index on the view
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS latest_transactions_stock_congressman_idx
+            ON latest_transactions (stock_id, congressman_id);
+        """,
+    ]),
+    (2, "hot-path indexes", [
+        # Repeat-trade self-join and per-stock history
+        """
+        CREATE INDEX IF NOT EXISTS transactions_stock_congressman_date_idx
+            ON transactions (stock_id, congressman_id, transaction_date DESC);
+        """,
+        "CREATE INDEX IF NOT EXISTS transactions_date_idx ON transactions (transaction_date);",
+        # GET /favorites
+        """
+        CREATE INDEX IF NOT EXISTS favorite_stocks_user_created_idx
+            ON favorite_stocks (user_id, created_at DESC);
+        """,
+        # load_existing_data keyset pages and date filters
+        """
+        CREATE INDEX IF NOT EXISTS latest_transactions_date_idx
+            ON latest_transactions (transaction_date, id);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS latest_transactions_congressman_date_idx
+            ON latest_transactions (congressman_id, transaction_date, id);
+        """,
+        # ticker_prefix filter (LIKE 'AB%' cannot use the collation-aware unique index)
+        """
+        CREATE INDEX IF NOT EXISTS stocks_ticker_pattern_idx
+            ON stocks (ticker text_pattern_ops);
+        """,
+    ]),
+    (3, "trades_raw content hash", [
+        "ALTER TABLE trades_raw ADD COLUMN IF NOT EXISTS content_hash CHAR(64);",
+        # Same fingerprint save_data_grouped computes: sha256 of the canonical jsonb text
+        """
+        UPDATE trades_raw
+        SET content_hash = encode(sha256(convert_to(raw_content::text, 'UTF8')), 'hex')
+        WHERE content_hash IS NULL;
+        """,
+        # Keep the first copy of every row scraped more than once
+        """
+        DELETE FROM trades_raw a
+        USING trades_raw b
+        WHERE a.content_hash = b.content_hash AND a.id > b.id;
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS trades_raw_content_hash_idx ON trades_raw (content_hash);",
+    ]),
+    (4, "pipeline run history", [
+        """
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            id SERIAL PRIMARY KEY,
+            stage VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL, -- running/success/failed
+            started_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER,
+            rows_in INTEGER,
+            rows_out INTEGER,
+            details JSONB,
+            error TEXT
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS pipeline_runs_started_idx ON pipeline_runs (started_at DESC);",
+        "CREATE INDEX IF NOT EXISTS pipeline_runs_stage_started_idx ON pipeline_runs (stage, started_at DESC);",
+    ]),
+    (5, "returns since congressional trade", [
+        """
+        CREATE TABLE IF NOT EXISTS transaction_returns (
+            transaction_id INTEGER PRIMARY KEY REFERENCES transactions(id) ON DELETE CASCADE,
+            ticker VARCHAR(100) NOT NULL,
+            trade_price_date DATE,
+            trade_close DOUBLE PRECISION,
+            latest_date DATE,
+            latest_close DOUBLE PRECISION,
+            return_pct DOUBLE PRECISION,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS transaction_returns_ticker_idx ON transaction_returns (ticker);",
+    ]),
+    (6, "stocks.name NOT NULL UNIQUE everywhere", [
+        # Databases first created by PelosiDB's old init_db got stocks.name from the
+        # ADD COLUMN in migration 1, without the NOT NULL UNIQUE of the baseline table.
+        # Missing names become the ticker; a later duplicate gets " (TICKER)" appended.
+        """
+        WITH named AS (
+            SELECT id, ticker, COALESCE(NULLIF(name, ''), ticker) AS name, (name IS NULL OR name = '') AS filled
+            FROM stocks
+        ),
+        ranked AS (
+            SELECT id, ticker, name, ROW_NUMBER() OVER (PARTITION BY name ORDER BY filled, id) AS name_rank
+            FROM named
+        )
+        UPDATE stocks s
+        SET name = CASE
+            WHEN r.name_rank = 1 THEN r.name
+            ELSE left(left(r.name, greatest(0, 97 - length(r.ticker))) || ' (' || r.ticker || ')', 100)
+        END
+        FROM ranked r
+        WHERE s.id = r.id AND (s.name IS DISTINCT FROM r.name OR r.name_rank > 1);
+        """,
+        "ALTER TABLE stocks ALTER COLUMN name SET NOT NULL;",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+                WHERE c.conrelid = 'stocks'::regclass AND c.contype = 'u'
+                    AND a.attname = 'name' AND array_length(c.conkey, 1) = 1
+            ) THEN
+                ALTER TABLE stocks ADD CONSTRAINT stocks_name_key UNIQUE (name);
+            END IF;
+        END $$;
+        """,
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cur) -> int:
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+
+def migrate(conn) -> int:
+    """
+    Apply pending migrations in one transaction and return how many ran.
+
+    When the database is already at SCHEMA_VERSION this costs two cheap reads and
+    no DDL, which is the normal case on every restart.
+    """
+    with conn.cursor() as cur:
+        if current_version(cur) >= SCHEMA_VERSION:
+            conn.rollback()
+            return 0
+
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_ID,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            """)
+            # Another replica may have migrated while we waited for the lock.
+            version = current_version(cur)
+            applied = 0
+            for number, name, statements in MIGRATIONS:
+                if number <= version:
+                    continue
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                    (number, name),
+                )
+                logging.info(f"Applied migration {number}: {name}")
+                applied += 1
+            conn.commit()
+            return applied
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,74 @@
+"""
+bcrypt hashing off the request path.
+
+Hashes run on a small dedicated thread pool (bcrypt releases the GIL while it
+works), so a burst of logins uses at most PASSWORD_HASH_WORKERS cores and never
+the threads that serve data routes. AUTH_MAX_CONCURRENCY bounds how many auth
+requests may wait for that pool; beyond it, callers get AuthOverloaded after
+AUTH_QUEUE_TIMEOUT_SECONDS instead of queueing without limit.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import os
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+AUTH_MAX_CONCURRENCY = int(os.getenv("AUTH_MAX_CONCURRENCY", "8"))
+AUTH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("AUTH_QUEUE_TIMEOUT_SECONDS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_auth_slots = asyncio.Semaphore(AUTH_MAX_CONCURRENCY)
+
+
+class AuthOverloaded(Exception):
+    pass
+
+
+@asynccontextmanager
+async def auth_admission():
+    try:
+        await asyncio.wait_for(_auth_slots.acquire(), timeout=AUTH_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise AuthOverloaded("Too many authentication requests in flight")
+    try:
+        yield
+    finally:
+        _auth_slots.release()
+
+
+def _hash(password: str) -> str:
+    import bcrypt  # loaded on the first auth request, not at startup
+
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+
+def _check(password: str, password_hash: str) -> bool:
+    import bcrypt
+
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def needs_rehash(password_hash: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt+digest>
+    try:
+        return int(password_hash.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_executor, _hash, password)
+
+
+async def check_password(password: str, password_hash: str):
+    """
+    Returns:
+        (matches, new_hash): new_hash is a hash at the current BCRYPT_ROUNDS when
+        the password matched but was stored at a different cost, else None.
+    """
+    loop = asyncio.get_running_loop()
+    matches = await loop.run_in_executor(_executor, _check, password, password_hash)
+    if matches and needs_rehash(password_hash):
+        return True, await loop.run_in_executor(_executor, _hash, password)
+    return matches, None
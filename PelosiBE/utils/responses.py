@@ -0,0 +1,35 @@
+"""
+orjson-backed JSON responses.
+
+orjson serializes the date/datetime values and tuple rows that db_io returns
+natively, so large payloads skip both FastAPI's jsonable_encoder pass and the
+stdlib json encoder. Routes with heavy payloads return json_response(...)
+directly; everything else still benefits through default_response_class.
+"""
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, "item"):  # NumPy/pandas scalars not covered by OPT_SERIALIZE_NUMPY
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+def json_response(content, status_code: int = 200) -> FastJSONResponse:
+    return FastJSONResponse(content, status_code=status_code)
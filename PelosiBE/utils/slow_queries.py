@@ -0,0 +1,187 @@
+"""
+Slow-query log for every statement run through the connection pool.
+
+The pool creates connections with TimedCursor as their cursor factory, so each
+execute() is timed. Statements slower than SLOW_QUERY_MS are logged and kept in
+a ring buffer (GET /admin/slow-queries) with the calling db_io function, the
+shape of their parameters (types and lengths, never values) and, for a sampled
+and rate-limited subset, their plan:
+
+    reads (SELECT/WITH without writes)  EXPLAIN (ANALYZE, BUFFERS), which re-runs the query
+    writes (INSERT/UPDATE/DELETE)       plain EXPLAIN, so nothing is applied twice
+    anything else (DDL, REFRESH, ...)   no plan
+"""
+from collections import deque
+from datetime import datetime
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+import psycopg2.extensions
+
+from .metrics import Counter
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "250"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.2"))
+SLOW_QUERY_EXPLAIN_PER_MINUTE = int(os.getenv("SLOW_QUERY_EXPLAIN_PER_MINUTE", "6"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+STATEMENT_MAX_CHARS = 2000
+
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ("function",))
+
+_READ_KINDS = {"select", "with", "values", "table"}
+_WRITE_KINDS = {"insert", "update", "delete", "merge"}
+_WRITE_WORDS = re.compile(r"\b(insert|update|delete|merge)\b", re.IGNORECASE)
+_LEADING_NOISE = re.compile(r"^(\s+|--[^\n]*\n|/\*.*?\*/|\()+", re.DOTALL)
+
+_log = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_explain_times = deque()
+_lock = threading.Lock()
+_counts = {"slow": 0, "explained": 0, "sampled_out": 0, "rate_limited": 0, "explain_failed": 0}
+
+
+def _statement_text(cur, query) -> str:
+    if hasattr(query, "as_string"):  # psycopg2.sql.Composable
+        query = query.as_string(cur)
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    return query
+
+
+def _params_shape(params):
+    """Types and sizes only: parameters can hold emails, password hashes, tokens."""
+    def shape(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        return type(value).__name__
+
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: shape(value) for key, value in params.items()}
+    return [shape(value) for value in params]
+
+
+def _caller() -> str:
+    # Only walked for slow statements, so the frame inspection cost does not matter.
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").endswith("db_io"):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "unknown"
+
+
+def _statement_kind(statement: str) -> str:
+    body = _LEADING_NOISE.sub("", statement, count=1)
+    return body.split(None, 1)[0].lower() if body.strip() else ""
+
+
+def _explain_prefix(statement: str):
+    kind = _statement_kind(statement)
+    if kind in _READ_KINDS and not _WRITE_WORDS.search(statement):
+        return "EXPLAIN (ANALYZE, BUFFERS) "
+    if kind in _READ_KINDS or kind in _WRITE_KINDS:
+        return "EXPLAIN "
+    return None
+
+
+def _may_explain():
+    if random.random() >= SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        _counts["sampled_out"] += 1
+        return False
+    now = time.monotonic()
+    while _explain_times and now - _explain_times[0] > 60:
+        _explain_times.popleft()
+    if len(_explain_times) >= SLOW_QUERY_EXPLAIN_PER_MINUTE:
+        _counts["rate_limited"] += 1
+        return False
+    _explain_times.append(now)
+    return True
+
+
+def _explain(conn, prefix: str, statement: str, params):
+    # A separate plain cursor keeps the caller's result set intact, and the
+    # savepoint keeps a failed EXPLAIN from aborting the caller's transaction.
+    in_transaction = not conn.autocommit
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+        if in_transaction:
+            cur.execute("SAVEPOINT slow_query_explain;")
+        try:
+            cur.execute(prefix + statement, params)
+            plan = [row[0] for row in cur.fetchall()]
+        except psycopg2.Error:
+            if in_transaction:
+                cur.execute("ROLLBACK TO SAVEPOINT slow_query_explain;")
+            raise
+        if in_transaction:
+            cur.execute("RELEASE SAVEPOINT slow_query_explain;")
+    return plan
+
+
+def _record(cur, query, params, seconds: float):
+    statement = _statement_text(cur, query)
+    function = _caller()
+    entry = {
+        "at": datetime.now().isoformat(timespec="seconds"),
+        "function": function,
+        "duration_ms": round(seconds * 1000, 1),
+        "statement": " ".join(statement.split())[:STATEMENT_MAX_CHARS],
+        "params_shape": _params_shape(params),
+        "plan": None,
+        "plan_analyzed": False,
+    }
+
+    prefix = _explain_prefix(statement)
+    with _lock:
+        _counts["slow"] += 1
+        explain = prefix is not None and _may_explain()
+    if explain:
+        try:
+            entry["plan"] = _explain(cur.connection, prefix, statement, params)
+            entry["plan_analyzed"] = "ANALYZE" in prefix
+            with _lock:
+                _counts["explained"] += 1
+        except Exception as e:
+            entry["plan_error"] = str(e)
+            with _lock:
+                _counts["explain_failed"] += 1
+
+    with _lock:
+        _log.append(entry)
+    SLOW_QUERIES.inc((function,))
+    logging.warning(
+        f"Slow query in {function}: {entry['duration_ms']} ms, params {entry['params_shape']}: "
+        f"{entry['statement'][:300]}" + ("\n" + "\n".join(entry["plan"]) if entry["plan"] else "")
+    )
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        result = super().execute(query, vars)
+        elapsed = time.perf_counter() - started
+        # Failed statements raise before this point: their transaction is aborted and cannot be explained.
+        if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+            _record(self, query, vars, elapsed)
+        return result
+
+
+def recent_slow_queries(limit: int = 50):
+    """Newest first, with the logger's counters and settings."""
+    with _lock:
+        entries = list(_log)[-limit:][::-1]
+        counts = dict(_counts)
+    return {
+        "threshold_ms": SLOW_QUERY_MS,
+        "explain_sample_rate": SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        "explain_per_minute": SLOW_QUERY_EXPLAIN_PER_MINUTE,
+        "counts": counts,
+        "queries": entries,
+    }
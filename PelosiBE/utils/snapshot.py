@@ -0,0 +1,221 @@
+"""
+Columnar price snapshot: every ticker's bars in one memory-mappable file.
+
+Layout (little-endian):
+
+    b"PELOSNP1"                 magic
+    uint64                      header length
+    header                      JSON: tickers (sorted), offsets, company names,
+                                build window, each ticker's stored coverage,
+                                row count and each column's dtype/offset
+    columns                     date (datetime64[D]), open/high/low/close (float64),
+                                volume (int64), each 64-byte aligned
+
+Rows are grouped by ticker and sorted by date; ticker i owns rows
+offsets[i]:offsets[i + 1]. The header also keeps each ticker's fetched range
+from price_history_coverage at build time, and a window is only served from the
+file when it lies inside that range and the build window. Readers map the file
+and hand out NumPy views into it, so serving a chart parses nothing and copies
+nothing. Files are written to a temporary name and renamed into place, so a
+reader sees either the old or the new snapshot, never a partial one.
+"""
+from datetime import date, datetime
+import json
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"PELOSNP1"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+COLUMNS = (
+    ("date", "<M8[D]"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+)
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def bars_to_columns(bars):
+    """[(date, open, high, low, close, volume), ...] -> {column: ndarray}; missing prices become NaN."""
+    values = list(zip(*bars)) if bars else [()] * len(COLUMNS)
+    columns = {}
+    for (name, dtype), column in zip(COLUMNS, values):
+        if name == "volume":
+            column = [v or 0 for v in column]
+        columns[name] = np.array(column, dtype=dtype)
+    return columns
+
+
+def write_snapshot(path: str, histories, company_names=None, start=None, end=None, coverage=None):
+    """
+    Write (ticker, bars) pairs to `path` atomically.
+
+    `coverage` maps ticker -> (covered_start, covered_end) as stored in
+    price_history_coverage; tickers without it are never served from the file.
+
+    `histories` may be a generator; each ticker is converted to compact arrays
+    as it arrives, so callers can stream the source in chunks.
+
+    Returns:
+        {"path", "tickers", "rows", "bytes"}
+    """
+    company_names = company_names or {}
+    coverage = coverage or {}
+    per_ticker = {}
+    for ticker, bars in histories:
+        if bars:
+            per_ticker[ticker.upper()] = bars_to_columns(bars)
+
+    tickers = sorted(per_ticker)
+    offsets = [0]
+    for ticker in tickers:
+        offsets.append(offsets[-1] + len(per_ticker[ticker]["date"]))
+    rows = offsets[-1]
+
+    column_specs, position = {}, 0
+    for name, dtype in COLUMNS:
+        position = _align(position)
+        column_specs[name] = {"dtype": dtype, "offset": position}
+        position += rows * np.dtype(dtype).itemsize
+
+    header = json.dumps({
+        "version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,  # exclusive
+        "rows": rows,
+        "tickers": tickers,
+        "offsets": offsets,
+        "company_names": {t: company_names.get(t) for t in tickers},
+        "coverage": {t: [d.isoformat() for d in coverage[t]] for t in tickers if t in coverage},
+        "columns": column_specs,
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for name, _ in COLUMNS:
+                f.write(b"\0" * (data_start + column_specs[name]["offset"] - f.tell()))
+                for ticker in tickers:
+                    f.write(per_ticker[ticker][name].tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"path": path, "tickers": len(tickers), "rows": rows, "bytes": os.path.getsize(path)}
+
+
+class Snapshot:
+    """Read-only view of a snapshot file; column arrays point straight into the mapping."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a price snapshot")
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_length])
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.header['version']}")
+
+        data_start = _align(header_start + header_length)
+        rows = self.header["rows"]
+        self.columns = {
+            name: (
+                np.frombuffer(self._mmap, dtype=spec["dtype"], count=rows, offset=data_start + spec["offset"])
+                if rows else np.empty(0, dtype=spec["dtype"])
+            )
+            for name, spec in self.header["columns"].items()
+        }
+        self._offsets = self.header["offsets"]
+        self._index = {ticker: i for i, ticker in enumerate(self.header["tickers"])}
+        self.start = date.fromisoformat(self.header["start"]) if self.header["start"] else None
+        self.end = date.fromisoformat(self.header["end"]) if self.header["end"] else None
+        self._coverage = {
+            ticker: (date.fromisoformat(first), date.fromisoformat(last))
+            for ticker, (first, last) in self.header["coverage"].items()
+        }
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._index
+
+    @property
+    def tickers(self):
+        return self.header["tickers"]
+
+    def company_name(self, ticker: str):
+        return self.header["company_names"].get(ticker.upper())
+
+    def covers(self, ticker: str, start: date, end: date) -> bool:
+        """
+        True when [start, end) lies inside both the window the snapshot was built
+        for and the range the ticker's prices had been fetched for at the time.
+        """
+        if (self.start and start < self.start) or (self.end and end > self.end):
+            return False
+        coverage = self._coverage.get(ticker.upper())
+        return coverage is not None and coverage[0] <= start and end <= coverage[1]
+
+    def history(self, ticker: str, start: date = None, end: date = None):
+        """
+        One ticker's bars in [start, end) as {column: ndarray} views (no copy),
+        or None if the ticker is not in the snapshot.
+        """
+        i = self._index.get(ticker.upper())
+        if i is None:
+            return None
+        lo, hi = self._offsets[i], self._offsets[i + 1]
+        dates = self.columns["date"][lo:hi]
+        first = dates.searchsorted(np.datetime64(start, "D")) if start else 0
+        last = dates.searchsorted(np.datetime64(end, "D")) if end else len(dates)
+        return {name: column[lo + first:lo + last] for name, column in self.columns.items()}
+
+
+def load_snapshot(path: str):
+    """
+    Shared reader for `path`, or None if there is no usable snapshot (none yet,
+    or one written in another format version).
+
+    Re-opened when the file is replaced; views handed out earlier keep the old
+    mapping alive until they are dropped.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is None or cached[0] != key:
+            try:
+                snapshot = Snapshot(path)
+            except ValueError as e:
+                print(f"Ignoring price snapshot {path}: {e}")
+                snapshot = None
+            cached = _loaded[path] = (key, snapshot)
+        return cached[1]
@@ -1,17 +1,63 @@
-from fastapi import FastAPI, Body
+import time
+_imports_started = time.perf_counter()
+
+from fastapi import FastAPI, Body, Query, Response
+from fastapi.responses import JSONResponse
+from typing import Optional
 from services.scheduler import start_scheduler
-from utils.db_io import save_data_grouped, load_congresspeople, load_tickers, find_same_politician_same_stock_type
-from services.stocks import get_stock_info, fetch_all_ticker_data  # Added fetch_all_ticker_data
-from utils.db import init_db
+from utils.db_io import save_data_grouped, load_congresspeople, load_tickers, find_same_politician_same_stock_type, list_pipeline_runs
+from utils.db import init_db, pool_stats
+from utils import startup
+from utils.security import check_api_security
+from utils.slow_queries import recent_slow_queries
+from utils.metrics import CONTENT_TYPE, MetricsMiddleware, render, update_pool_gauges
 import uvicorn
 
+startup.imports_done(_imports_started)
+
 app = FastAPI()
+app.add_middleware(MetricsMiddleware)
 
 # --- STARTUP LOGIC ---
 @app.on_event("startup")
 def on_startup():
-    init_db()         # 1. Prepare Database Tables
-    start_scheduler()  # 2. Start the background tasks ONLY once here
+    # Prepare the database, then start the background tasks (only once, here).
+    # Runs off the event loop so /healthz answers while it finishes; see /readyz.
+    startup.run_in_background([
+        ("db_init", init_db),
+        ("warm_imports", lambda: startup.warm_imports("utils.snapshot", "yfinance", "lxml.html")),
+        ("scheduler", start_scheduler),
+    ])
+
+# --- ROUTES ---
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    report = startup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+@app.get("/pipeline/runs")
+def get_pipeline_runs(
+    limit: int = Query(50, ge=1, le=500),
+    stage: Optional[str] = Query(None),
+    password: Optional[str] = Query(None),
+):
+    check_api_security(password)
+    return list_pipeline_runs(limit=limit, stage=stage)
+
+@app.get("/admin/slow-queries")
+def get_slow_queries(limit: int = Query(50, ge=1, le=500), password: Optional[str] = Query(None)):
+    check_api_security(password)
+    return recent_slow_queries(limit)
+
+@app.get("/metrics")
+def metrics(password: Optional[str] = Query(None)):
+    check_api_security(password)
+    update_pool_gauges(pool_stats())
+    return Response(render(), media_type=CONTENT_TYPE)
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
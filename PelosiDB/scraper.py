@@ -1,23 +1,211 @@
-from playwright.sync_api import sync_playwright
+"""
+QuiverQuant congress-trade scraper.
+
+Two stages: fetch (headless Chromium, optionally saving the rendered HTML as a
+snapshot) and parse. The live scrape extracts the table in-page; saved snapshots
+are parsed with lxml and no browser, so ingest and parsing can be exercised
+offline. Before a snapshot is saved, each cell's innerText is recorded on it
+(data-inner-text), so parsing the snapshot returns exactly the live rows even
+where line breaks come from CSS, which lxml cannot see:
+
+    python scraper.py --save-snapshot data/snapshots      # live scrape, keep the page
+    python scraper.py --from-snapshot data/snapshots/x.html [--ingest] [--repeat 50]
+"""
+import argparse
+from datetime import datetime
+import os
+import re
+import time
+
+TRADES_URL = "https://www.quiverquant.com/congresstrading/"
+ROWS_SELECTOR = "div.table-inner tbody tr"
+
+# Only the document, its scripts and its stylesheets are needed to read the trades
+# table. Stylesheets stay: innerText follows CSS layout, and parse_trade_row splits
+# ticker, company and asset type on line breaks that may come from display:block.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Whole table as a 2-D array of cell texts in one round trip to the browser.
+EXTRACT_TABLE_JS = """
+rows => rows.map(row => Array.from(row.querySelectorAll("td"), td => td.innerText.trim()))
+"""
+
+# innerText depends on layout, so it is recorded on each cell before a snapshot is saved.
+RECORDED_TEXT_ATTR = "data-inner-text"
+RECORD_TEXT_JS = """
+rows => rows.forEach(row => row.querySelectorAll("td").forEach(
+    td => td.setAttribute("data-inner-text", td.innerText.trim())
+))
+"""
+
+# XPath equivalent of ROWS_SELECTOR for the lxml parser
+ROWS_XPATH = "//div[contains(concat(' ', normalize-space(@class), ' '), ' table-inner ')]//tbody/tr"
+
+# Elements that start a new line in innerText
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "ol", "p", "pre", "section",
+    "table", "tbody", "td", "th", "thead", "tr", "ul",
+}
+_SKIPPED_TAGS = {"script", "style", "template", "noscript"}
+_WHITESPACE = re.compile(r"\s+")
+
+# Phase durations (seconds) of the most recent scrape: launch, navigation, wait, extract, total
+last_scrape_timings = {}
+
+
+def _block_non_essential(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+
+def _save_snapshot(html: str, snapshot_dir: str) -> str:
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f"quiverquant_{datetime.now().strftime('%Y%m%dT%H%M%S')}.html")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, path)
+    return path
+
+
+def scrape_congress_trades(snapshot_dir: str = None):
+    # Imported here so offline parsing does not need Playwright or a browser installed.
+    from playwright.sync_api import sync_playwright
+
+    timings = {}
+    started = phase_started = time.perf_counter()
+
+    def mark(phase):
+        nonlocal phase_started
+        now = time.perf_counter()
+        timings[phase] = round(now - phase_started, 3)
+        phase_started = now
 
-def scrape_congress_trades():
     with sync_playwright() as p:
         browser = p.chromium.launch(headless=True)
         # For Linux, you may need to specify the path to the Chromium executable if it's not in the default location. Uncomment the lines below and adjust the path as needed.
         # browser = p.chromium.launch(
-        #     executable_path="/usr/bin/chromium-browser", 
+        #     executable_path="/usr/bin/chromium-browser",
         #     headless=True
         # )
         context = browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/115.0.0.0 Safari/537.36"
         )
+        context.route("**/*", _block_non_essential)
         page = context.new_page()
-        page.goto("https://www.quiverquant.com/congresstrading/", timeout=90000)
-        page.wait_for_selector("div.table-inner tbody tr", timeout=60000)
+        mark("launch")
+
+        page.goto(TRADES_URL, timeout=90000, wait_until="domcontentloaded")
+        mark("navigation")
+
+        page.wait_for_selector(ROWS_SELECTOR, timeout=60000)
+        mark("wait")
+
+        data = page.eval_on_selector_all(ROWS_SELECTOR, EXTRACT_TABLE_JS)
+        mark("extract")
+
+        if snapshot_dir:
+            page.eval_on_selector_all(ROWS_SELECTOR, RECORD_TEXT_JS)
+            print(f"Saved page snapshot to {_save_snapshot(page.content(), snapshot_dir)}")
 
-        rows = page.query_selector_all("div.table-inner tbody tr")
-        data = [[c.inner_text().strip() for c in r.query_selector_all("td")] for r in rows]
-        
         browser.close()
-        print(f"Scraped {len(data)} rows of data.")
-        return [row for row in data if row]
+
+    timings["total"] = round(time.perf_counter() - started, 3)
+    last_scrape_timings.clear()
+    last_scrape_timings.update(timings)
+    print(
+        f"Scraped {len(data)} rows of data in {timings['total']}s "
+        f"(launch {timings['launch']}s, navigation {timings['navigation']}s, "
+        f"wait {timings['wait']}s, extract {timings['extract']}s)."
+    )
+    return [row for row in data if row]
+
+
+def _cell_text(cell) -> str:
+    """
+    The cell's innerText as recorded when the snapshot was saved, else an
+    approximation: block elements break lines, whitespace collapses. The
+    approximation cannot see CSS (e.g. spans styled display:block), which is
+    why snapshots to be ingested need the recorded text.
+    """
+    recorded = cell.get(RECORDED_TEXT_ATTR)
+    if recorded is not None:
+        return recorded
+
+    parts = []
+
+    def walk(element):
+        tag = element.tag if isinstance(element.tag, str) else None
+        if tag in _SKIPPED_TAGS:
+            return
+        if tag in _BLOCK_TAGS:
+            parts.append("\n")
+        # Source newlines are whitespace like any other; only elements break lines.
+        if tag and element.text:
+            parts.append(_WHITESPACE.sub(" ", element.text))
+        for child in element:
+            walk(child)
+            if child.tail:
+                parts.append(_WHITESPACE.sub(" ", child.tail))
+        if tag in _BLOCK_TAGS:
+            parts.append("\n")
+
+    walk(cell)
+    lines = (" ".join(line.split()) for line in "".join(parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def parse_trades_html(html: str):
+    """Extract the trades table from a saved page as the same rows scrape_congress_trades returns."""
+    import lxml.html
+
+    document = lxml.html.fromstring(html)
+    data = [[_cell_text(td) for td in row.xpath(".//td")] for row in document.xpath(ROWS_XPATH)]
+    return [row for row in data if row]
+
+
+def load_snapshot_rows(path: str):
+    with open(path, encoding="utf-8") as f:
+        return parse_trades_html(f.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape or parse QuiverQuant congress trades.")
+    parser.add_argument("--from-snapshot", metavar="HTML", help="parse a saved page instead of launching a browser")
+    parser.add_argument("--save-snapshot", metavar="DIR", help="when scraping live, also save the rendered page here")
+    parser.add_argument("--ingest", action="store_true", help="write the parsed rows with save_data_grouped")
+    parser.add_argument("--repeat", type=int, default=1, help="parse the snapshot N times and report timing")
+    args = parser.parse_args()
+
+    if args.from_snapshot:
+        with open(args.from_snapshot, encoding="utf-8") as f:
+            html = f.read()
+        # Approximated rows can differ from live ones, changing their content hash
+        # and inserting the same trades into trades_raw a second time.
+        if args.ingest and f'{RECORDED_TEXT_ATTR}="' not in html:
+            parser.error(f"{args.from_snapshot} has no recorded cell text; re-save it with --save-snapshot to ingest it")
+        started = time.perf_counter()
+        for _ in range(max(args.repeat, 1)):
+            rows = parse_trades_html(html)
+        elapsed = (time.perf_counter() - started) / max(args.repeat, 1)
+        print(f"Parsed {len(rows)} rows from {args.from_snapshot} in {elapsed * 1000:.2f} ms per parse.")
+    else:
+        rows = scrape_congress_trades(snapshot_dir=args.save_snapshot)
+
+    if args.ingest:
+        from utils.db import init_db
+        from utils.db_io import save_data_grouped
+
+        init_db()
+        summary = save_data_grouped(rows)
+        print(
+            f"Ingested: {summary['new']} new, {summary['skipped']} skipped, "
+            f"{summary['transactions_inserted']} transactions, {len(summary['rejected'])} rejected."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Return since each congressional trade, precomputed from stored prices.
+
+For every transaction whose stored return is missing or stale (the ticker has a
+newer bar than the one used last time) the job looks up the close on the trade
+date and the latest close, across all affected transactions at once with pandas,
+and upserts the result into transaction_returns.
+"""
+from datetime import timedelta
+import logging
+
+import pandas as pd
+
+from utils.db_io import load_closes, load_transactions_needing_returns, save_transaction_returns
+
+# A trade on a weekend or holiday is priced at the last close before it, up to a week back.
+TRADE_PRICE_TOLERANCE = pd.Timedelta(days=7)
+
+RETURN_COLUMNS = [
+    "transaction_id",
+    "ticker",
+    "trade_price_date",
+    "trade_close",
+    "latest_date",
+    "latest_close",
+    "return_pct",
+]
+
+
+def compute_returns(trades: pd.DataFrame, prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Args:
+        trades: transaction_id, ticker, transaction_date
+        prices: ticker, date, close
+
+    Returns:
+        One row per trade with RETURN_COLUMNS; prices that cannot be found are NaN.
+    """
+    trades = trades.assign(transaction_date=pd.to_datetime(trades["transaction_date"]))
+    prices = prices.assign(date=pd.to_datetime(prices["date"])).sort_values(["date", "ticker"])
+
+    priced = pd.merge_asof(
+        trades.sort_values("transaction_date"),
+        prices.rename(columns={"date": "trade_price_date", "close": "trade_close"}),
+        left_on="transaction_date",
+        right_on="trade_price_date",
+        by="ticker",
+        direction="backward",
+        tolerance=TRADE_PRICE_TOLERANCE,
+    )
+    latest = (
+        prices.sort_values(["ticker", "date"])
+        .groupby("ticker", sort=False)
+        .tail(1)
+        .rename(columns={"date": "latest_date", "close": "latest_close"})
+    )
+    priced = priced.merge(latest, on="ticker", how="left")
+    priced["return_pct"] = ((priced["latest_close"] / priced["trade_close"] - 1) * 100).round(2)
+    return priced[RETURN_COLUMNS]
+
+
+def refresh_transaction_returns():
+    """Recompute returns for new trades and for tickers with new prices; returns the row count."""
+    rows = load_transactions_needing_returns()
+    if not rows:
+        logging.info("Transaction returns are up to date.")
+        return 0
+
+    trades = pd.DataFrame.from_records(rows, columns=["transaction_id", "ticker", "transaction_date"])
+    since = trades["transaction_date"].min() - timedelta(days=TRADE_PRICE_TOLERANCE.days)
+    prices = pd.DataFrame.from_records(
+        load_closes(trades["ticker"].unique().tolist(), since), columns=["ticker", "date", "close"]
+    )
+
+    result = compute_returns(trades, prices)
+    for column in ("trade_price_date", "latest_date"):
+        result[column] = result[column].dt.date
+    records = result.astype(object).where(result.notna(), None).itertuples(index=False, name=None)
+    saved = save_transaction_returns(list(records))
+    logging.info(f"Updated returns for {saved} transactions.")
+    return saved
@@ -1,28 +1,163 @@
 # scheduler.py
+"""
+Daily data pipeline, split into stages that are scheduled independently:
+
+    scrape        -> QuiverQuant table (cron); hands its rows to ingest when done
+    ingest        -> save_data_grouped on the latest scraped rows
+    price_refresh -> incremental price_history refresh (own cron)
+    returns       -> return since each trade, queued after ingest and price_refresh
+
+Every stage run is recorded in pipeline_runs with timings and row counts, so a
+slow price refresh no longer delays ingest and a failure leaves a trace.
+"""
 from apscheduler.schedulers.background import BackgroundScheduler
-from scraper import scrape_congress_trades
-from utils.db_io import save_data_grouped
-from services.stocks import fetch_all_ticker_data
+from contextlib import contextmanager
+from scraper import scrape_congress_trades, last_scrape_timings
+from utils.db_io import save_data_grouped, start_pipeline_run, finish_pipeline_run
+from utils.metrics import Gauge
 from datetime import datetime  # Import datetime to trigger immediate run
 import logging
+import os
+import threading
+import time
 
-def run_daily_scrape():
+SCRAPE_HOUR = int(os.getenv("SCRAPE_HOUR", "12"))
+PRICE_REFRESH_HOUR = int(os.getenv("PRICE_REFRESH_HOUR", "13"))
+MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "3600"))
+SCRAPE_SNAPSHOT_DIR = os.getenv("SCRAPE_SNAPSHOT_DIR")
+
+# Same policy for every stage: never overlap with itself, collapse a backlog of
+# missed runs into one, and still run if the process was busy or down briefly.
+JOB_DEFAULTS = {"max_instances": 1, "coalesce": True, "misfire_grace_time": MISFIRE_GRACE_SECONDS}
+
+STAGE_LAST_DURATION = Gauge("pipeline_stage_last_duration_seconds", "Duration of the latest run of each stage", ("stage",))
+STAGE_LAST_SUCCESS = Gauge("pipeline_stage_last_success", "1 if the latest run of the stage succeeded, else 0", ("stage",))
+STAGE_LAST_FINISHED = Gauge("pipeline_stage_last_finished_timestamp_seconds", "Unix time the latest run of each stage ended", ("stage",))
+
+scheduler = None
+_pending_rows = None
+_pending_lock = threading.Lock()
+
+
+@contextmanager
+def record_stage(stage: str):
+    """Time a stage and store the outcome in pipeline_runs; the body fills in `run`."""
+    run = {"rows_in": None, "rows_out": None, "details": None}
+    run_id = None
     try:
-        rows = scrape_congress_trades()
-        save_data_grouped(rows)
-        fetch_all_ticker_data()
-        logging.info(f"Scraped and saved {len(rows)} trades.")
+        run_id = start_pipeline_run(stage)
     except Exception as e:
-        logging.error(f"Scheduled task error: {e}")
+        logging.error(f"Could not record start of {stage}: {e}")
+
+    started = time.perf_counter()
+    status, error = "success", None
+    try:
+        yield run
+    except Exception as e:
+        status, error = "failed", str(e)
+        logging.error(f"Pipeline stage {stage} failed: {e}")
+    finally:
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        logging.info(f"Pipeline stage {stage} {status} in {duration_ms} ms.")
+        STAGE_LAST_DURATION.set(duration_ms / 1000, (stage,))
+        STAGE_LAST_SUCCESS.set(1 if status == "success" else 0, (stage,))
+        STAGE_LAST_FINISHED.set(time.time(), (stage,))
+        if run_id is not None:
+            try:
+                finish_pipeline_run(
+                    run_id, status, duration_ms, run["rows_in"], run["rows_out"], run["details"], error
+                )
+            except Exception as e:
+                logging.error(f"Could not record end of {stage}: {e}")
+
+
+def _queue_stage(func, job_id: str):
+    """Run a downstream stage as its own job, right away."""
+    if scheduler is not None:
+        scheduler.add_job(func, id=job_id, replace_existing=True, next_run_time=datetime.now())
+
+
+def run_scrape_stage():
+    global _pending_rows
+    with record_stage("scrape") as run:
+        rows = scrape_congress_trades(snapshot_dir=SCRAPE_SNAPSHOT_DIR)
+        run["rows_out"] = len(rows)
+        run["details"] = {"timings": dict(last_scrape_timings)}
+        with _pending_lock:
+            _pending_rows = rows
+    _queue_stage(run_ingest_stage, "ingest")
+
+
+def run_ingest_stage():
+    global _pending_rows
+    with _pending_lock:
+        rows, _pending_rows = _pending_rows, None
+    if not rows:
+        logging.info("Ingest stage: no scraped rows waiting.")
+        return
+
+    with record_stage("ingest") as run:
+        run["rows_in"] = len(rows)
+        summary = save_data_grouped(rows)
+        run["rows_out"] = summary["new"]
+        run["details"] = {
+            "staged": summary["staged"],
+            "skipped": summary["skipped"],
+            "transactions_inserted": summary["transactions_inserted"],
+            "rejected": len(summary["rejected"]),
+        }
+    _queue_stage(run_returns_stage, "returns")
+
+
+def run_price_refresh_stage():
+    # Stage modules pull in pandas/yfinance; importing them here keeps startup light.
+    from services.stocks import fetch_all_ticker_data
+
+    with record_stage("price_refresh") as run:
+        result = fetch_all_ticker_data()
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        stats = result.get("stats", {})
+        run["rows_in"] = stats.get("tickers_total")
+        run["rows_out"] = stats.get("bars")
+        run["details"] = {k: v for k, v in stats.items() if k != "errors"}
+        run["details"]["failed_tickers"] = sorted(stats.get("errors", {}))[:50]
+    _queue_stage(run_returns_stage, "returns")
+
+
+def run_returns_stage():
+    from services.returns import refresh_transaction_returns
+
+    with record_stage("returns") as run:
+        run["rows_out"] = refresh_transaction_returns()
+
+
+def run_daily_scrape():
+    # Kept for manual runs: every stage in sequence.
+    run_scrape_stage()
+    run_ingest_stage()
+    run_price_refresh_stage()
+    run_returns_stage()
+
 
 def start_scheduler():
-    scheduler = BackgroundScheduler()
+    global scheduler
+    scheduler = BackgroundScheduler(job_defaults=JOB_DEFAULTS)
+    scheduler.add_job(
+        run_scrape_stage,
+        trigger='cron',
+        id="scrape",
+        hour=SCRAPE_HOUR,
+        minute=0,
+        next_run_time=datetime.now()
+    )
     scheduler.add_job(
-        run_daily_scrape, 
-        trigger='cron', 
-        hour=12, 
-        minute=0, 
-        next_run_time=datetime.now() 
+        run_price_refresh_stage,
+        trigger='cron',
+        id="price_refresh",
+        hour=PRICE_REFRESH_HOUR,
+        minute=0,
+        next_run_time=datetime.now()
     )
     scheduler.start()
     logging.info("Scheduler started.")
@@ -0,0 +1,59 @@
+"""
+Browserless parsing of saved pages: the lxml innerText approximation on
+markup-only cells, and recorded cell text taking precedence over it.
+"""
+import lxml.html
+
+from scraper import _cell_text, parse_trades_html
+
+
+def cell(html: str):
+    return lxml.html.fromstring(f"<table><tr>{html}</tr></table>").xpath("//td")[0]
+
+
+def test_block_elements_break_lines():
+    assert _cell_text(cell("<td><div>Purchase</div><div>$1,001 - $15,000</div></td>")) == "Purchase\n$1,001 - $15,000"
+
+
+def test_br_breaks_lines():
+    html = "<td><a><span>MSFT</span><br><span>MICROSOFT CORPORATION - COMMON STOCK</span><br><span>ST</span></a></td>"
+    assert _cell_text(cell(html)) == "MSFT\nMICROSOFT CORPORATION - COMMON STOCK\nST"
+
+
+def test_inline_elements_join_and_block_ones_break():
+    html = "<td><a><span>Nancy</span> Pelosi</a><p>House / D</p></td>"
+    assert _cell_text(cell(html)) == "Nancy Pelosi\nHouse / D"
+
+
+def test_whitespace_collapses_and_blank_lines_drop():
+    html = "<td>\n    Jan.   12,\n  2024 <div>  </div>\n</td>"
+    assert _cell_text(cell(html)) == "Jan. 12, 2024"
+
+
+def test_script_and_style_are_skipped():
+    assert _cell_text(cell("<td>12.41%<script>track()</script><style>.x{}</style></td>")) == "12.41%"
+
+
+def test_recorded_text_takes_precedence():
+    html = '<td data-inner-text="NFLX&#10;NETFLIX, INC. - COMMON STOCK"><span>NFLX</span><span>NETFLIX, INC. - COMMON STOCK</span></td>'
+    assert _cell_text(cell(html)) == "NFLX\nNETFLIX, INC. - COMMON STOCK"
+
+
+def test_parse_reads_only_the_trades_table_body():
+    html = """
+    <html><body>
+    <table><tbody><tr><td>not a trade</td></tr></tbody></table>
+    <div class="table-outer"><div class="table-inner"><table>
+    <thead><tr><th>Stock</th><th>Transaction</th></tr></thead>
+    <tbody>
+    <tr><td>NFLX<br>NETFLIX, INC. - COMMON STOCK<br>ST</td><td><div>Purchase</div><div>$1,001 - $15,000</div></td></tr>
+    <tr></tr>
+    <tr><td>MSFT</td><td>Sale (Full)</td></tr>
+    </tbody>
+    </table></div></div>
+    </body></html>
+    """
+    assert parse_trades_html(html) == [
+        ["NFLX\nNETFLIX, INC. - COMMON STOCK\nST", "Purchase\n$1,001 - $15,000"],
+        ["MSFT", "Sale (Full)"],
+    ]
@@ -1,9 +1,15 @@
+from contextlib import contextmanager
 import os
+import threading
+import time
 
 import psycopg2
 from psycopg2 import pool
 from dotenv import load_dotenv
 
+from .migrations import SCHEMA_VERSION, migrate
+from .slow_queries import TimedCursor
+
 load_dotenv()
 
 def _get_required_env(name: str) -> str:
@@ -12,75 +18,167 @@ def _get_required_env(name: str) -> str:
         raise RuntimeError(f"Missing required environment variable: {name}")
     return value
 
-# Database configuration - Use environment variables
-DB_CONFIG = {
-    "host": _get_required_env("DB_HOST"),
-    "database": _get_required_env("DB_NAME"),
-    "user": _get_required_env("DB_USER"),
-    "password": _get_required_env("DB_PASSWORD"),
-    "port": _get_required_env("DB_PORT"),
-    "sslmode": _get_required_env("DB_SSLMODE"),
-}
+def _db_config():
+    # Read when the pool is created rather than at import, so a missing
+    # variable surfaces in the startup report instead of killing the import.
+    return {
+        "host": _get_required_env("DB_HOST"),
+        "database": _get_required_env("DB_NAME"),
+        "user": _get_required_env("DB_USER"),
+        "password": _get_required_env("DB_PASSWORD"),
+        "port": _get_required_env("DB_PORT"),
+        "sslmode": _get_required_env("DB_SSLMODE"),
+    }
+
+# Pool sizing and behaviour
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+# Connections idle longer than this get a SELECT 1 before being handed out
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+
+
+class PoolTimeout(pool.PoolError):
+    pass
+
+
+class BoundedConnectionPool:
+    """
+    Thread-safe pool that waits for a free connection instead of failing.
+
+    psycopg2's ThreadedConnectionPool is safe to share between threads but raises
+    as soon as it is exhausted; a semaphore in front of it makes checkout block
+    for up to `timeout` seconds. Connections are checked on checkout (closed
+    ones are replaced, long-idle ones are pinged) and usage is counted for
+    pool_stats().
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, healthcheck_idle: float, **kwargs):
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.replaced = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def getconn(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available within {timeout}s")
+        waited = time.monotonic() - started
+
+        try:
+            conn = self._healthy(self._pool.getconn())
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        return conn
+
+    def _healthy(self, conn):
+        idle = time.monotonic() - self._last_used.get(id(conn), time.monotonic())
+        if not conn.closed and idle < self.healthcheck_idle:
+            return conn
+        if not conn.closed:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1;")
+                conn.rollback()
+                return conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                pass
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+        with self._lock:
+            self.replaced += 1
+        return self._pool.getconn()
+
+    def putconn(self, conn):
+        # ThreadedConnectionPool rolls back any open transaction before reuse.
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=conn.closed != 0)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max": self.maxconn,
+                "in_use": self.in_use,
+                "idle": len(self._pool._pool),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "replaced": self.replaced,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
 
 # Initialize connection pool
 connection_pool = None
+# Set once the pool exists and the schema is current; requests wait for it.
+_pool_ready = threading.Event()
 
 def init_db():
     global connection_pool
     if not connection_pool:
-        connection_pool = psycopg2.pool.SimpleConnectionPool(1, 10, **DB_CONFIG)
-    
+        connection_pool = BoundedConnectionPool(
+            DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_IDLE,
+            cursor_factory=TimedCursor, **_db_config()
+        )
+
     conn = connection_pool.getconn()
-    cur = conn.cursor()
-    
-    # Table 1: Raw Data (Full Scraped Data)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS trades_raw (
-        id SERIAL PRIMARY KEY,
-        raw_content JSONB,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-
-    # Table 2: Congressmen
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS congressmen (
-        id SERIAL PRIMARY KEY,
-        name VARCHAR(255) UNIQUE NOT NULL,
-        chamber VARCHAR(50),
-        party VARCHAR(10)
-    );
-    """)
-
-    # Table 3: Stocks
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS stocks (
-        id SERIAL PRIMARY KEY,
-        ticker VARCHAR(100) UNIQUE NOT NULL,
-        company_name TEXT
-    );
-    """)
-
-    # Table 4: Transactions (The link table)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS transactions (
-        id SERIAL PRIMARY KEY,
-        congressman_id INTEGER REFERENCES congressmen(id),
-        stock_id INTEGER REFERENCES stocks(id),
-        transaction_type VARCHAR(20), -- Purchase/Sale
-        transaction_date DATE,
-        amount_range VARCHAR(100),
-        UNIQUE(congressman_id, stock_id, transaction_date, amount_range, transaction_type)
-    );
-    """)
-
-    conn.commit()
-    cur.close()
-    connection_pool.putconn(conn)
-    print("Database tables initialized successfully.")
+    try:
+        applied = migrate(conn)
+    finally:
+        connection_pool.putconn(conn)
+    _pool_ready.set()
+    if applied:
+        print(f"Database migrated to schema version {SCHEMA_VERSION} ({applied} migration(s) applied).")
+    else:
+        print(f"Database schema is current (version {SCHEMA_VERSION}).")
+
+def db_ready() -> bool:
+    return _pool_ready.is_set()
 
 def get_db_connection():
+    # init_db runs in the background at startup; early requests wait for it like for a busy pool.
+    if not _pool_ready.wait(DB_POOL_TIMEOUT):
+        raise PoolTimeout("Database is not ready yet")
     return connection_pool.getconn()
 
 def release_db_connection(conn):
-    connection_pool.putconn(conn)
\ No newline at end of file
+    connection_pool.putconn(conn)
+
+@contextmanager
+def db_connection():
+    """Check out a pooled connection that is always returned, even if the body raises."""
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        release_db_connection(conn)
+
+def pool_stats():
+    return connection_pool.stats() if connection_pool else None
@@ -1,8 +1,11 @@
+import csv
+import io
 import json
 import logging
 from datetime import datetime
-from psycopg2.extras import Json 
-from .db import get_db_connection, release_db_connection
+from psycopg2.extras import Json, execute_values
+from .db import db_connection
+from .metrics import db_timed
 
 def parse_date(date_str):
     try:
@@ -38,136 +41,637 @@ def extract_company_name(stock_string):
         # If still too long, try splitting by dash
         if len(company_name) > 20:
             company_name = company_name.split(" - ")[0].strip()
-        
-        print(company_name)
 
         return company_name
     except:
         return ""
 
+# Column limits from the schema; longer values are rejected per row instead of
+# failing the whole set-based insert.
+_FIELD_LIMITS = {
+    "congressman_name": 255,
+    "chamber": 50,
+    "party": 10,
+    "ticker": 100,
+    "stock_name": 100,
+    "transaction_type": 20,
+    "amount_range": 100,
+}
+
+_STAGING_COLUMNS = (
+    "row_index",
+    "raw_content",
+    "congressman_name",
+    "chamber",
+    "party",
+    "ticker",
+    "company_description",
+    "stock_name",
+    "transaction_type",
+    "transaction_date",
+    "amount_range",
+)
+
+
+def parse_trade_row(row):
+    """
+    Split one scraped table row into the normalized fields save_data_grouped stores.
+
+    Raises:
+        ValueError: if the row is malformed or a field does not fit its column
+    """
+    if not row or len(row) < 7:
+        raise ValueError("expected 7 columns")
+
+    # Congressman
+    name_parts = row[2].split("\n")
+    name = name_parts[0].strip()
+    chamber_party = name_parts[1].split("/") if len(name_parts) > 1 else ["Unknown", "Unknown"]
+    chamber = chamber_party[0].strip()
+    party = chamber_party[1].strip() if len(chamber_party) > 1 else ""
+    if not name:
+        raise ValueError("missing congressman name")
+
+    # Stock
+    stock_lines = row[0].split("\n")
+    ticker_raw = stock_lines[0].strip()
+    company_name = extract_company_name(row[0])
+    full_company_description = stock_lines[1].strip() if len(stock_lines) > 1 else ""
+
+    # If ticker is "-" (common in your JSON), use the company description instead
+    if ticker_raw == "-" and "Company:" in row[5]:
+        ticker_raw = row[5].split(":")[1].split("(")[0].strip()[:10]
+    elif ticker_raw == "-":
+        company_name = full_company_description
+    if not ticker_raw:
+        raise ValueError("missing ticker")
+
+    # Transaction
+    trans_parts = row[1].split("\n")
+    fields = {
+        "congressman_name": name,
+        "chamber": chamber,
+        "party": party,
+        "ticker": ticker_raw,
+        "company_description": full_company_description,
+        "stock_name": company_name,
+        "transaction_type": trans_parts[0].strip(),
+        "transaction_date": parse_date(row[4]),
+        "amount_range": trans_parts[1].strip() if len(trans_parts) > 1 else "",
+    }
+    for field, limit in _FIELD_LIMITS.items():
+        if len(fields[field]) > limit:
+            raise ValueError(f"{field} longer than {limit} characters")
+    return fields
+
+
+def _copy_to_staging(cur, records):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for record in records:
+        writer.writerow([r"\N" if record[c] is None else record[c] for c in _STAGING_COLUMNS])
+    buf.seek(0)
+    cur.copy_expert(
+        f"COPY trades_staging ({', '.join(_STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buf,
+    )
+
+
+@db_timed
 def save_data_grouped(rows):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    for row in rows:
-        # SAFETY CHECK: Skip rows that don't have all 7 expected columns
-        if not row or len(row) < 7:
+    """
+    Ingest scraped rows with a constant number of round trips.
+
+    Only rows whose content hash is not yet in trades_raw are processed, so the
+    daily cost follows the number of new trades rather than the page size. A
+    row's hash is recorded only once it has been stored, so rejected rows are
+    tried again on the next scrape.
+
+    Rows are parsed in Python, COPY'd into a temporary staging table and then
+    merged into trades_raw, congressmen, stocks and transactions with one
+    set-based statement each, all in a single transaction. Rows that cannot be
+    parsed or whose stock cannot be stored are reported, never silently dropped,
+    and never take the good rows down with them.
+
+    Returns:
+        {"rows", "staged", "new", "skipped", "transactions_inserted",
+         "rejected": [{"row", "error"}]}
+    """
+    records, rejected, seen = [], [], set()
+    duplicates_in_batch = 0
+    for index, row in enumerate(rows):
+        try:
+            fields = parse_trade_row(row)
+        except Exception as e:
+            if row:
+                rejected.append({"row": index, "error": str(e)})
+            continue
+        if fields["transaction_date"] is None:
+            rejected.append({"row": index, "error": f"unparseable transaction date {row[4]!r}"})
+            continue
+        raw_content = json.dumps(row)
+        if raw_content in seen:
+            duplicates_in_batch += 1
             continue
-            
+        seen.add(raw_content)
+        fields["row_index"] = index
+        fields["raw_content"] = raw_content
+        records.append(fields)
+
+    summary = {
+        "rows": len(rows),
+        "staged": len(records),
+        "new": 0,
+        "skipped": duplicates_in_batch,
+        "transactions_inserted": 0,
+        "rejected": rejected,
+    }
+    if not records:
+        return summary
+
+    with db_connection() as conn:
         try:
-            # 1. Save to Raw Table - Use Json() adapter to avoid formatting issues
-            cur.execute(
-                "INSERT INTO trades_raw (raw_content) VALUES (%s)", 
-                [Json(row)] # Using a list [] instead of a tuple () for clarity
-            )
-            
-            # 2. Extract Congressman
-            name_parts = row[2].split("\n")
-            name = name_parts[0].strip()
-            chamber_party = name_parts[1].split("/") if len(name_parts) > 1 else ["Unknown", "Unknown"]
-            chamber = chamber_party[0].strip()
-            party = chamber_party[1].strip() if len(chamber_party) > 1 else ""
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE trades_staging (
+                        row_index INTEGER,
+                        raw_content JSONB,
+                        congressman_name TEXT,
+                        chamber TEXT,
+                        party TEXT,
+                        ticker TEXT,
+                        company_description TEXT,
+                        stock_name TEXT,
+                        transaction_type TEXT,
+                        transaction_date DATE,
+                        amount_range TEXT,
+                        content_hash CHAR(64)
+                    ) ON COMMIT DROP;
+                """)
+                _copy_to_staging(cur, records)
+
+                # Fingerprint each row by its canonical jsonb text; rows already in
+                # trades_raw from an earlier scrape drop out of staging here, so the
+                # upserts below only ever see trades we have not processed before.
+                cur.execute("""
+                    UPDATE trades_staging
+                    SET content_hash = encode(sha256(convert_to(raw_content::text, 'UTF8')), 'hex');
+                """)
+                cur.execute("""
+                    DELETE FROM trades_staging st
+                    USING trades_raw r
+                    WHERE r.content_hash = st.content_hash;
+                """)
+                summary["skipped"] += cur.rowcount
+                summary["new"] = len(records) - cur.rowcount
+                if not summary["new"]:
+                    conn.commit()
+                    return summary
+
+                # Last scraped row wins, as with the old row-by-row upserts.
+                cur.execute("""
+                    INSERT INTO congressmen (name, chamber, party)
+                    SELECT DISTINCT ON (congressman_name) congressman_name, chamber, party
+                    FROM trades_staging
+                    ORDER BY congressman_name, row_index DESC
+                    ON CONFLICT (name) DO UPDATE SET chamber = EXCLUDED.chamber;
+                """)
+
+                # stocks.name is UNIQUE, so a name already used by another ticker (in the
+                # table or earlier in this batch) would abort the whole statement; those
+                # tickers are skipped here and reported below.
+                cur.execute("""
+                    WITH candidates AS (
+                        SELECT DISTINCT ON (ticker) ticker, company_description, stock_name
+                        FROM trades_staging
+                        ORDER BY ticker, row_index DESC
+                    ),
+                    ranked AS (
+                        SELECT c.*, ROW_NUMBER() OVER (PARTITION BY stock_name ORDER BY ticker) AS name_rank
+                        FROM candidates c
+                    )
+                    INSERT INTO stocks (ticker, company_name, name)
+                    SELECT r.ticker, r.company_description, r.stock_name
+                    FROM ranked r
+                    WHERE r.name_rank = 1
+                        AND NOT EXISTS (
+                            SELECT 1 FROM stocks s WHERE s.name = r.stock_name AND s.ticker <> r.ticker
+                        )
+                    ON CONFLICT (ticker) DO UPDATE SET
+                        company_name = COALESCE(NULLIF(EXCLUDED.company_name, ''), stocks.company_name),
+                        name = COALESCE(NULLIF(EXCLUDED.name, ''), stocks.name);
+                """)
 
-            cur.execute("""
-                INSERT INTO congressmen (name, chamber, party) 
-                VALUES (%s, %s, %s) ON CONFLICT (name) DO UPDATE SET chamber=EXCLUDED.chamber 
-                RETURNING id
-            """, (name, chamber, party))
-            congressman_id = cur.fetchone()[0]
-
-            # 3. Extract Stock
-            ticker_raw = row[0].split("\n")[0].strip()
-            company_name = extract_company_name(row[0])
-            full_company_description = row[0].split("\n")[1].strip() if len(row[0].split("\n")) > 1 else ""
-            
-            # If ticker is "-" (common in your JSON), use the company description instead
-            if ticker_raw == "-" and "Company:" in row[5]:
-                ticker_raw = row[5].split(":")[1].split("(")[0].strip()[:10]
-            elif ticker_raw == "-":
-                company_name = row[0].split("\n")[1].strip()
-            
-            cur.execute("""
-                INSERT INTO stocks (ticker, company_name, name) 
-                VALUES (%s, %s, %s) 
-                ON CONFLICT (ticker) DO UPDATE SET 
-                    company_name=COALESCE(NULLIF(EXCLUDED.company_name, ''), stocks.company_name),
-                    name=COALESCE(NULLIF(EXCLUDED.name, ''), stocks.name)
-                RETURNING id
-            """, (ticker_raw, full_company_description, company_name))
-            
-            stock_res = cur.fetchone()
-            stock_id = stock_res[0] if stock_res else None
-            
-            if not stock_id:
-                cur.execute("SELECT id FROM stocks WHERE ticker = %s", (ticker_raw,))
-                stock_id = cur.fetchone()[0]
-
-            # 4. Save Transaction
-            trans_parts = row[1].split("\n")
-            trans_type = trans_parts[0].strip()
-            amount = trans_parts[1].strip() if len(trans_parts) > 1 else ""
-            trans_date = parse_date(row[4]) 
-
-            if trans_date and stock_id:
                 cur.execute("""
                     INSERT INTO transactions (congressman_id, stock_id, transaction_type, transaction_date, amount_range)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT DO NOTHING
-                """, (congressman_id, stock_id, trans_type, trans_date, amount))
+                    SELECT c.id, s.id, st.transaction_type, st.transaction_date, st.amount_range
+                    FROM trades_staging st
+                    JOIN congressmen c ON c.name = st.congressman_name
+                    JOIN stocks s ON s.ticker = st.ticker
+                    WHERE st.transaction_date IS NOT NULL
+                    ON CONFLICT DO NOTHING;
+                """)
+                summary["transactions_inserted"] = cur.rowcount
 
-        except Exception as e:
-            # Log the exact error and which row caused it
-            print(f"Error processing row {row[2] if len(row)>2 else 'Unknown'}: {e}")
+                cur.execute("""
+                    SELECT st.row_index, st.ticker
+                    FROM trades_staging st
+                    WHERE NOT EXISTS (SELECT 1 FROM stocks s WHERE s.ticker = st.ticker)
+                    ORDER BY st.row_index;
+                """)
+                for row_index, ticker in cur.fetchall():
+                    rejected.append({"row": row_index, "error": f"stock {ticker} conflicts with an existing stock name"})
+
+                # Only rows that were stored are remembered; rejected ones are retried
+                # (and reported again) on the next scrape instead of being skipped as seen.
+                cur.execute("""
+                    INSERT INTO trades_raw (raw_content, content_hash)
+                    SELECT st.raw_content, st.content_hash
+                    FROM trades_staging st
+                    WHERE EXISTS (SELECT 1 FROM stocks s WHERE s.ticker = st.ticker)
+                    ORDER BY st.row_index
+                    ON CONFLICT (content_hash) DO NOTHING;
+                """)
+
+                conn.commit()
+                refresh_latest_transactions(cur)
+                conn.commit()
+        except Exception:
             conn.rollback()
-            continue
+            raise
+
+    for item in rejected:
+        print(f"Rejected scraped row {item['row']}: {item['error']}")
+    return summary
 
-    conn.commit()
-    cur.close()
-    release_db_connection(conn)
 
+def refresh_latest_transactions(cur):
+    """Rebuild latest_transactions without blocking readers of the old contents."""
+    cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY latest_transactions;")
+
+@db_timed
 def load_congresspeople():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT politician FROM trades ORDER BY politician;")
-    results = [r[0] for r in cur.fetchall()]
-    cur.close()
-    release_db_connection(conn)
-    return results
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT id, name FROM congressmen ORDER BY name;")
+            return [(r[0], r[1]) for r in cur.fetchall()]
 
+@db_timed
 def load_tickers():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT DISTINCT ticker FROM trades ORDER BY ticker;")
-    results = [r[0] for r in cur.fetchall()]
-    cur.close()
-    release_db_connection(conn)
-    return results
-
-def find_same_politician_same_stock_type(ticker=None, politician=None):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # This SQL finds entries where the politician and stock type (from raw text) match
-    # It replaces that complex triple-nested loop you had
-    query = """
-        SELECT t1.purchase_date, t1.politician, t1.raw_ticker_text, t1.raw_politician_text, t2.raw_ticker_text
-        FROM trades t1
-        JOIN trades t2 ON t1.politician = t2.politician 
-            AND right(t1.raw_ticker_text, 2) = right(t2.raw_ticker_text, 2)
-            AND t1.id < t2.id
-        WHERE 1=1
+    print("Loading tickers from DB...")
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT DISTINCT ticker FROM stocks ORDER BY ticker;")
+            return [r[0] for r in cur.fetchall()]
+
+@db_timed
+def find_same_politician_same_stock_type(pairs):
     """
-    params = []
-    if ticker:
-        query += " AND t1.ticker = %s"
-        params.append(ticker.upper())
-    if politician:
-        query += " AND t1.politician ILIKE %s"
-        params.append(f"%{politician}%")
-
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    cur.close()
-    release_db_connection(conn)
-    
-    return [{"date": r[0], "politician": r[1], "match": r} for r in rows]
\ No newline at end of file
+    Repeat trades by the same politician in the same stock and transaction type.
+
+    Every (ticker, politician) pair is matched in one set-based query: the pairs
+    are sent as two arrays, the politician is a case-insensitive substring of
+    congressmen.name, and each result carries the pair it answers. Pairs with
+    neither a ticker nor a politician are ignored rather than matching everything.
+
+    Args:
+        pairs: iterable of {"ticker": ..., "politician": ...} dicts
+
+    Returns:
+        [{"date", "politician", "ticker", "match": (first_date, politician, ticker,
+          transaction_type, repeat_date)}] grouped in request order
+    """
+    tickers, politicians = [], []
+    for pair in pairs:
+        ticker = (pair.get("ticker") or "").strip().upper()
+        politician = (pair.get("politician") or "").strip()
+        if ticker or politician:
+            tickers.append(ticker or None)
+            politicians.append(politician or None)
+    if not tickers:
+        return []
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH req AS (
+                    SELECT ord, ticker, politician
+                    FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS r(ticker, politician, ord)
+                ),
+                matched AS (
+                    SELECT DISTINCT req.ord, c.id AS congressman_id, c.name, s.id AS stock_id, s.ticker
+                    FROM req
+                    JOIN congressmen c
+                        ON req.politician IS NULL OR c.name ILIKE '%%' || req.politician || '%%'
+                    JOIN stocks s
+                        ON req.ticker IS NULL OR s.ticker = req.ticker
+                )
+                SELECT t1.transaction_date, m.name, m.ticker, t1.transaction_type, t2.transaction_date
+                FROM matched m
+                JOIN transactions t1
+                    ON t1.stock_id = m.stock_id AND t1.congressman_id = m.congressman_id
+                JOIN transactions t2
+                    ON t2.stock_id = t1.stock_id
+                    AND t2.congressman_id = t1.congressman_id
+                    AND t2.transaction_type = t1.transaction_type
+                    AND t1.id < t2.id
+                ORDER BY m.ord, t1.transaction_date, t2.transaction_date;
+                """,
+                (tickers, politicians),
+            )
+            rows = cur.fetchall()
+            return [{"date": r[0], "politician": r[1], "ticker": r[2], "match": r} for r in rows]
+
+
+@db_timed
+def get_price_coverage(ticker: str):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT company_name, covered_start, covered_end
+                FROM price_history_coverage
+                WHERE ticker = %s;
+                """,
+                (ticker.upper(),),
+            )
+            row = cur.fetchone()
+            if not row:
+                return None
+            return {"company_name": row[0], "covered_start": row[1], "covered_end": row[2]}
+
+
+@db_timed
+def load_price_coverage_all():
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT ticker, company_name, covered_start, covered_end FROM price_history_coverage;")
+            return {
+                r[0]: {"company_name": r[1], "covered_start": r[2], "covered_end": r[3]}
+                for r in cur.fetchall()
+            }
+
+
+@db_timed
+def load_price_history(ticker: str, start, end):
+    """Return stored (date, open, high, low, close, volume) bars with start <= date < end."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT date, open, high, low, close, volume
+                FROM price_history
+                WHERE ticker = %s AND date >= %s AND date < %s
+                ORDER BY date;
+                """,
+                (ticker.upper(), start, end),
+            )
+            return cur.fetchall()
+
+
+@db_timed
+def iter_price_history(tickers, start, end, itersize: int = 20000):
+    """
+    Yield (ticker, [(date, open, high, low, close, volume), ...]) one ticker at a time.
+
+    Rows come through a server-side cursor in batches of `itersize`, so only the
+    ticker being assembled is held in memory, however long the full history is.
+    """
+    with db_connection() as conn:
+        with conn.cursor(name="iter_price_history") as cur:
+            cur.itersize = itersize
+            cur.execute(
+                """
+                SELECT ticker, date, open, high, low, close, volume
+                FROM price_history
+                WHERE ticker = ANY(%s) AND date >= %s AND date < %s
+                ORDER BY ticker, date;
+                """,
+                ([t.upper() for t in tickers], start, end),
+            )
+            ticker, bars = None, []
+            for row in cur:
+                if row[0] != ticker:
+                    if bars:
+                        yield ticker, bars
+                    ticker, bars = row[0], []
+                bars.append(row[1:])
+            if bars:
+                yield ticker, bars
+        conn.rollback()
+
+
+@db_timed
+def load_company_names():
+    """{ticker: long name} from the price store, else the name scraped with the trades."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT s.ticker, COALESCE(NULLIF(c.company_name, 'N/A'), NULLIF(s.company_name, ''), s.name)
+                FROM stocks s
+                LEFT JOIN price_history_coverage c ON c.ticker = s.ticker;
+                """
+            )
+            return {r[0]: r[1] for r in cur.fetchall() if r[1]}
+
+
+@db_timed
+def save_price_history(ticker: str, bars, covered_start, covered_end, company_name=None):
+    """
+    Upsert daily bars for a ticker and widen its fetched range in a single transaction.
+
+    Args:
+        bars: iterable of (date, open, high, low, close, volume) tuples
+        covered_start, covered_end: the [start, end) window now known to be fetched
+        company_name: long name to remember so later reads skip the yfinance .info call
+    """
+    ticker = ticker.upper()
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                if bars:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO price_history (ticker, date, open, high, low, close, volume)
+                        VALUES %s
+                        ON CONFLICT (ticker, date) DO UPDATE SET
+                            open = EXCLUDED.open,
+                            high = EXCLUDED.high,
+                            low = EXCLUDED.low,
+                            close = EXCLUDED.close,
+                            volume = EXCLUDED.volume;
+                        """,
+                        [(ticker, *bar) for bar in bars],
+                        page_size=1000,
+                    )
+                cur.execute(
+                    """
+                    INSERT INTO price_history_coverage (ticker, company_name, covered_start, covered_end)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (ticker) DO UPDATE SET
+                        company_name = COALESCE(EXCLUDED.company_name, price_history_coverage.company_name),
+                        covered_start = LEAST(price_history_coverage.covered_start, EXCLUDED.covered_start),
+                        covered_end = GREATEST(price_history_coverage.covered_end, EXCLUDED.covered_end),
+                        updated_at = CURRENT_TIMESTAMP;
+                    """,
+                    (ticker, company_name, covered_start, covered_end),
+                )
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+@db_timed
+def load_transactions_needing_returns():
+    """
+    Transactions whose stored return is missing or older than the ticker's latest bar.
+
+    Returns:
+        [(transaction_id, ticker, transaction_date)]
+    """
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                WITH latest AS (
+                    SELECT s.ticker, p.date AS latest_date
+                    FROM (SELECT DISTINCT upper(ticker) AS ticker FROM stocks) s
+                    CROSS JOIN LATERAL (
+                        SELECT date FROM price_history ph
+                        WHERE ph.ticker = s.ticker
+                        ORDER BY date DESC
+                        LIMIT 1
+                    ) p
+                )
+                SELECT t.id, l.ticker, t.transaction_date
+                FROM transactions t
+                JOIN stocks s ON s.id = t.stock_id
+                JOIN latest l ON l.ticker = upper(s.ticker)
+                LEFT JOIN transaction_returns r ON r.transaction_id = t.id
+                WHERE t.transaction_date IS NOT NULL
+                    AND (r.transaction_id IS NULL OR r.latest_date < l.latest_date);
+            """)
+            return cur.fetchall()
+
+
+@db_timed
+def load_closes(tickers, since):
+    """Return [(ticker, date, close)] for the given tickers from `since` on, in one query."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT ticker, date, close
+                FROM price_history
+                WHERE ticker = ANY(%s) AND date >= %s AND close IS NOT NULL
+                ORDER BY ticker, date;
+                """,
+                (list(tickers), since),
+            )
+            return cur.fetchall()
+
+
+@db_timed
+def save_transaction_returns(rows):
+    """Upsert (transaction_id, ticker, trade_price_date, trade_close, latest_date, latest_close, return_pct) rows."""
+    if not rows:
+        return 0
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO transaction_returns
+                        (transaction_id, ticker, trade_price_date, trade_close, latest_date, latest_close, return_pct)
+                    VALUES %s
+                    ON CONFLICT (transaction_id) DO UPDATE SET
+                        ticker = EXCLUDED.ticker,
+                        trade_price_date = EXCLUDED.trade_price_date,
+                        trade_close = EXCLUDED.trade_close,
+                        latest_date = EXCLUDED.latest_date,
+                        latest_close = EXCLUDED.latest_close,
+                        return_pct = EXCLUDED.return_pct,
+                        computed_at = CURRENT_TIMESTAMP;
+                    """,
+                    rows,
+                    page_size=1000,
+                )
+                conn.commit()
+                return len(rows)
+        except Exception:
+            conn.rollback()
+            raise
+
+
+@db_timed
+def start_pipeline_run(stage: str) -> int:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO pipeline_runs (stage, status, started_at)
+                VALUES (%s, 'running', CURRENT_TIMESTAMP)
+                RETURNING id;
+                """,
+                (stage,),
+            )
+            run_id = cur.fetchone()[0]
+            conn.commit()
+            return run_id
+
+
+@db_timed
+def finish_pipeline_run(run_id: int, status: str, duration_ms: int, rows_in=None, rows_out=None, details=None, error=None):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE pipeline_runs
+                SET status = %s,
+                    finished_at = CURRENT_TIMESTAMP,
+                    duration_ms = %s,
+                    rows_in = %s,
+                    rows_out = %s,
+                    details = %s,
+                    error = %s
+                WHERE id = %s;
+                """,
+                (status, duration_ms, rows_in, rows_out, Json(details) if details is not None else None, error, run_id),
+            )
+            conn.commit()
+
+
+@db_timed
+def list_pipeline_runs(limit: int = 50, stage: str = None):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            query = """
+                SELECT id, stage, status, started_at, finished_at, duration_ms, rows_in, rows_out, details, error
+                FROM pipeline_runs
+            """
+            params = []
+            if stage:
+                query += " WHERE stage = %s"
+                params.append(stage)
+            query += " ORDER BY started_at DESC LIMIT %s;"
+            params.append(limit)
+            cur.execute(query, params)
+            return [
+                {
+                    "id": r[0],
+                    "stage": r[1],
+                    "status": r[2],
+                    "started_at": r[3],
+                    "finished_at": r[4],
+                    "duration_ms": r[5],
+                    "rows_in": r[6],
+                    "rows_out": r[7],
+                    "details": r[8],
+                    "error": r[9],
+                }
+                for r in cur.fetchall()
+            ]
@@ -0,0 +1,204 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms share one registry guarded by a single lock;
+an update is a dict lookup, a bisect and a few additions, so instrumentation
+costs microseconds and stays on in production. GET /metrics renders it.
+"""
+import bisect
+from contextlib import contextmanager
+from functools import wraps
+import inspect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans fast index lookups up to slow yfinance downloads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = {}
+_lock = threading.Lock()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry[name] = self
+
+    def _samples(self, values):
+        for labels, value in values.items():
+            yield self.name, labels, (), value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount: float = 1.0):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, labels=()):
+        with _lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _samples(self, values):
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield self.name + "_bucket", labels, (("le", le),), cumulative
+            yield self.name + "_sum", labels, (), total
+            yield self.name + "_count", labels, (), cumulative
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(metric, labels, extra) -> str:
+    pairs = list(zip(metric.labelnames, labels)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render() -> str:
+    with _lock:
+        snapshot = [
+            (metric, {k: ([list(v[0]), v[1]] if isinstance(v, list) else v) for k, v in metric._values.items()})
+            for metric in _registry.values()
+        ]
+
+    lines = []
+    for metric, values in snapshot:
+        if not values:
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, extra, value in metric._samples(values):
+            lines.append(f"{name}{_format_labels(metric, labels, extra)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route")
+)
+HTTP_REQUESTS = Counter("http_requests_total", "Requests by route template and status", ("method", "route", "status"))
+
+DB_CALL_SECONDS = Histogram("db_call_duration_seconds", "Latency of each db_io function; _count is the call count", ("function",))
+DB_CALL_ERRORS = Counter("db_call_errors_total", "db_io calls that raised", ("function",))
+
+UPSTREAM_SECONDS = Histogram("upstream_request_duration_seconds", "yfinance/Finnhub call latency", ("service", "operation"))
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed yfinance/Finnhub calls", ("service", "operation"))
+
+DB_POOL = Gauge("db_pool", "Connection pool state (in_use, idle, max, checkouts, timeouts, replaced, wait_seconds_*)", ("stat",))
+
+
+def db_timed(func):
+    """Record latency and errors of a db_io function under its own name."""
+    labels = (func.__name__,)
+
+    if inspect.isgeneratorfunction(func):
+        # Time the whole iteration, not just the call that creates the generator.
+        @wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                yield from func(*args, **kwargs)
+            except Exception:
+                DB_CALL_ERRORS.inc(labels)
+                raise
+            finally:
+                DB_CALL_SECONDS.observe(time.perf_counter() - started, labels)
+
+        return generator_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            DB_CALL_ERRORS.inc(labels)
+            raise
+        finally:
+            DB_CALL_SECONDS.observe(time.perf_counter() - started, labels)
+
+    return wrapper
+
+
+@contextmanager
+def upstream_timer(service: str, operation: str):
+    labels = (service, operation)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(labels)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, labels)
+
+
+def update_pool_gauges(stats):
+    for stat, value in (stats or {}).items():
+        DB_POOL.set(value, (stat,))
+
+
+class MetricsMiddleware:
+    """Per-route latency and status counts, labelled by route template (e.g. /stocks/{ticker})."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths
+            # share one label so arbitrary URLs cannot grow the registry.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, (method, route))
+            HTTP_REQUESTS.inc((method, route, str(status_code)))
@@ -0,0 +1,31 @@
+"""
+API password check for PelosiDB's admin and monitoring routes.
+
+Same scheme as PelosiBE's utils/security.py (?password=API_PASSWORD); the
+service publishes its port, and these routes expose SQL text and plans.
+"""
+from fastapi import HTTPException, status
+from typing import Optional
+import os
+
+API_PASSWORD = os.getenv("API_PASSWORD", "secret_key")
+
+
+def verify_password(provided_password: str) -> bool:
+    return provided_password == API_PASSWORD
+
+
+def check_api_security(password: Optional[str] = None) -> None:
+    if password is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Password required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    if not verify_password(password):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,90 @@
+"""
+Startup timing and readiness.
+
+main.py records how long its own imports took, then the startup hook hands the
+slow steps (pool creation and migrations, loading heavy modules such as pandas
+and yfinance) to a background thread so the process answers /healthz at once.
+/readyz turns 200 when every step has finished and reports per-step timings
+either way.
+
+A failing step (database briefly unreachable, migration lock timeout) is
+retried with exponential backoff. If it still fails after
+STARTUP_MAX_ATTEMPTS the process exits, as a failed startup did before the
+steps moved off the main thread, so the container is restarted instead of
+staying up unready.
+"""
+import importlib
+import os
+import sys
+import threading
+import time
+
+STARTUP_MAX_ATTEMPTS = int(os.getenv("STARTUP_MAX_ATTEMPTS", "6"))
+STARTUP_RETRY_MAX_DELAY_SECONDS = 30
+
+_origin = time.perf_counter()
+_phases = {}
+_ready = threading.Event()
+_error = None
+
+
+def imports_done(started: float):
+    """Call at the end of main.py's imports with the perf_counter() taken before them."""
+    global _origin
+    _origin = started
+    _phases["imports"] = round(time.perf_counter() - started, 3)
+
+
+def warm_imports(*modules):
+    """Import heavy modules ahead of the first request that needs them."""
+    for name in modules:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        _phases[f"import:{name}"] = round(time.perf_counter() - started, 3)
+
+
+def _run_step(name, step):
+    global _error
+    for attempt in range(1, STARTUP_MAX_ATTEMPTS + 1):
+        try:
+            step()
+            _error = None
+            return True
+        except Exception as e:
+            _error = f"{name}: {e} (attempt {attempt}/{STARTUP_MAX_ATTEMPTS})"
+            print(f"Startup step {name} failed (attempt {attempt}/{STARTUP_MAX_ATTEMPTS}): {e}")
+            if attempt < STARTUP_MAX_ATTEMPTS:
+                time.sleep(min(2 ** (attempt - 1), STARTUP_RETRY_MAX_DELAY_SECONDS))
+    return False
+
+
+def _run(steps):
+    for name, step in steps:
+        started = time.perf_counter()
+        succeeded = _run_step(name, step)
+        _phases[name] = round(time.perf_counter() - started, 3)
+        if not succeeded:
+            print(f"Startup step {name} kept failing; exiting so the process is restarted.")
+            sys.stdout.flush()
+            os._exit(1)  # sys.exit would only end this thread
+    _phases["ready_after"] = round(time.perf_counter() - _origin, 3)
+    _ready.set()
+    print("Startup timings (s): " + ", ".join(f"{k} {v}" for k, v in _phases.items()))
+
+
+def run_in_background(steps):
+    """Run (name, callable) steps in order on a daemon thread; the process is ready when all succeed."""
+    threading.Thread(target=_run, args=(list(steps),), name="startup", daemon=True).start()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def report():
+    return {
+        "ready": _ready.is_set(),
+        "error": _error,
+        "uptime_seconds": round(time.perf_counter() - _origin, 3),
+        "phases": dict(_phases),
+    }
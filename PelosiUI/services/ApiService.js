@@ -96,6 +96,21 @@ export default class ApiService {
     return this.request('favorites', 'GET');
   }
 
+  // Favorites with latest stored price, day change and change since favorited
+  static async listFavoritesWithQuotes() {
+    return this.request('favorites?expand=quote', 'GET');
+  }
+
+  // { added: [...], existing: [...] }
+  static async addFavorites(tickers) {
+    return this.request('favorites/batch', 'POST', { tickers });
+  }
+
+  // { removed: [...], not_found: [...] }
+  static async removeFavorites(tickers) {
+    return this.request('favorites/batch', 'DELETE', { tickers });
+  }
+
   static async addFavorite(ticker) {
     return this.request('favorites', 'POST', { ticker });
   }
@@ -104,6 +119,13 @@ export default class ApiService {
     return this.request(`favorites/${encodeURIComponent(ticker)}`, 'DELETE');
   }
 
+  //_______________________Stock operations__________________________
+
+  // Price summaries/charts for many tickers in one request: { results: {TICKER: ...}, errors: {TICKER: msg} }
+  static async getStocksBatch(tickers, start, end) {
+    return this.request('stocks/batch', 'POST', { tickers, start, end });
+  }
+
   //_______________________Finnhub operations__________________________
   
   // Get stock recommendation trends (proxy via backend)
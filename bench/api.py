@@ -0,0 +1,235 @@
+"""
+Load test for every PelosiBE route, run in-process against a seeded database.
+
+Started by run.py with PYTHONPATH=PelosiBE and DB_* pointing at the benchmark
+database. Serves main:app with uvicorn on a local port (so middleware,
+compression and the thread pools are all in the path), then drives each
+scenario with a fixed number of concurrent httpx clients.
+"""
+import argparse
+import asyncio
+from datetime import date, timedelta
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from common import summarize
+from fakes import FakeFinnhub, install_fake_yfinance
+
+API_PASSWORD = "bench"
+# Statuses a scenario can legitimately return (e.g. deleting a favorite twice)
+OK_STATUSES = {200, 201, 404, 409}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app, port: int):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+class Scenario:
+    def __init__(self, name, method, route, make_request, requests=None, concurrency=None, auth=False, check=None):
+        """
+        make_request(i, rng) -> (path, json_body or None)
+        check(body) -> bool, for 200 responses: False counts as an error
+        """
+        self.name = name
+        self.method = method
+        self.route = route
+        self.make_request = make_request
+        self.requests = requests
+        self.concurrency = concurrency
+        self.auth = auth
+        self.check = check
+
+
+def build_scenarios(tickers, congressmen, heavy_requests: int):
+    today = date.today()
+    start, end = (today - timedelta(days=365)).isoformat(), today.isoformat()
+    pick = lambda rng: rng.choice(tickers)
+    pw = f"password={API_PASSWORD}"
+
+    return [
+        Scenario("root", "GET", "/", lambda i, rng: ("/", None)),
+        Scenario("healthz", "GET", "/healthz", lambda i, rng: ("/healthz", None)),
+        Scenario("readyz", "GET", "/readyz", lambda i, rng: ("/readyz", None)),
+        Scenario("stock_rows", "GET", "/stocks/{ticker}",
+                 lambda i, rng: (f"/stocks/{pick(rng)}?start={start}&end={end}&{pw}", None)),
+        Scenario("stock_columnar", "GET", "/stocks/{ticker}",
+                 lambda i, rng: (f"/stocks/{pick(rng)}?start={start}&end={end}&format=columnar&fields=open,high,low,volume&{pw}", None)),
+        Scenario("stock_batch", "POST", "/stocks/batch",
+                 lambda i, rng: (f"/stocks/batch?{pw}", {"tickers": rng.sample(tickers, min(10, len(tickers))),
+                                                         "start": start, "end": end, "format": "columnar"})),
+        Scenario("recommendation_trends", "GET", "/stocks/recommendation-trends/{ticker}",
+                 lambda i, rng: (f"/stocks/recommendation-trends/{pick(rng)}?{pw}", None)),
+        Scenario("company_news", "GET", "/stocks/company-news/{ticker}",
+                 lambda i, rng: (f"/stocks/company-news/{pick(rng)}?start={start}&end={end}&{pw}", None)),
+        Scenario("congresspeople", "GET", "/congresstrades/congresspeople",
+                 lambda i, rng: (f"/congresstrades/congresspeople?{pw}", None)),
+        Scenario("tickers", "GET", "/congresstrades/tickers",
+                 lambda i, rng: (f"/congresstrades/tickers?{pw}", None)),
+        Scenario("load_existing_data_full", "GET", "/congresstrades/load_existing_data",
+                 lambda i, rng: (f"/congresstrades/load_existing_data?{pw}", None), requests=heavy_requests),
+        Scenario("load_existing_data_page", "GET", "/congresstrades/load_existing_data",
+                 lambda i, rng: (f"/congresstrades/load_existing_data?since={start}&limit=100&{pw}", None)),
+        Scenario("load_existing_data_congressman", "GET", "/congresstrades/load_existing_data",
+                 lambda i, rng: (f"/congresstrades/load_existing_data?congressman_id={rng.choice(congressmen)}&{pw}", None)),
+        Scenario("find_same", "POST", "/congresstrades/find_same_politician_same_stock_type",
+                 lambda i, rng: (f"/congresstrades/find_same_politician_same_stock_type?{pw}",
+                                 [{"ticker": pick(rng), "politician": f"Member {rng.randrange(len(congressmen)):05d}"}
+                                  for _ in range(20)])),
+        Scenario("auth_register", "POST", "/auth/register",
+                 lambda i, rng: ("/auth/register", {"email": f"bench{i}-{rng.randrange(10**9)}@example.com",
+                                                    "password": "bench-password"})),
+        Scenario("auth_login", "POST", "/auth/login",
+                 lambda i, rng: ("/auth/login", {"email": "bench@example.com", "password": "bench-password"})),
+        Scenario("me", "GET", "/me", lambda i, rng: ("/me", None), auth=True),
+        Scenario("favorites", "GET", "/favorites", lambda i, rng: ("/favorites", None), auth=True),
+        Scenario("favorites_quote", "GET", "/favorites", lambda i, rng: ("/favorites?expand=quote", None), auth=True),
+        Scenario("favorite_add", "POST", "/favorites",
+                 lambda i, rng: ("/favorites", {"ticker": pick(rng)}), auth=True),
+        Scenario("favorite_delete", "DELETE", "/favorites/{ticker}",
+                 lambda i, rng: (f"/favorites/{pick(rng)}", None), auth=True),
+        Scenario("favorites_batch_add", "POST", "/favorites/batch",
+                 lambda i, rng: ("/favorites/batch", {"tickers": rng.sample(tickers, min(20, len(tickers)))}), auth=True),
+        Scenario("favorites_batch_remove", "DELETE", "/favorites/batch",
+                 lambda i, rng: ("/favorites/batch", {"tickers": rng.sample(tickers, min(20, len(tickers)))}), auth=True),
+        Scenario("cache_stats", "GET", "/admin/cache-stats", lambda i, rng: (f"/admin/cache-stats?{pw}", None)),
+        Scenario("pool_stats", "GET", "/admin/pool-stats", lambda i, rng: (f"/admin/pool-stats?{pw}", None)),
+        Scenario("metrics", "GET", "/metrics", lambda i, rng: (f"/metrics?{pw}", None)),
+        Scenario("slow_queries", "GET", "/admin/slow-queries", lambda i, rng: (f"/admin/slow-queries?{pw}", None)),
+        # Refreshes every ticker through the fake yfinance; one run is already a long request.
+        Scenario("fetch_all", "GET", "/stocks/fetch-all",
+                 lambda i, rng: (f"/stocks/fetch-all?start={start}&end={end}&{pw}", None), requests=1, concurrency=1,
+                 check=lambda body: body.get("count", 0) > 0 and bool(body.get("path"))),
+    ]
+
+
+async def run_scenario(client, scenario, requests: int, concurrency: int, token: str, seed: int):
+    rng = random.Random(seed)
+    # Requests are prepared up front so the timed loop measures only the server
+    prepared = [scenario.make_request(i, rng) for i in range(requests)]
+    headers = {"Authorization": f"Bearer {token}"} if scenario.auth else {}
+    latencies, errors, statuses = [], 0, {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < len(prepared):
+            path, body = prepared[next_index]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                resp = await client.request(scenario.method, path, json=body, headers=headers)
+                await resp.aread()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            if resp.status_code not in OK_STATUSES:
+                errors += 1
+            elif scenario.check and resp.status_code == 200 and not scenario.check(resp.json()):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    result.update(method=scenario.method, route=scenario.route, concurrency=concurrency,
+                  statuses={str(k): v for k, v in sorted(statuses.items())})
+    return result
+
+
+async def drive(base_url: str, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=600, limits=limits,
+                                 headers={"Accept-Encoding": "gzip, br"}) as client:
+        # The pool and migrations come up in the background after the server starts.
+        deadline = time.perf_counter() + 120
+        while (await client.get("/readyz")).status_code != 200:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("PelosiBE did not become ready")
+            await asyncio.sleep(0.2)
+
+        await client.post("/auth/register", json={"email": "bench@example.com", "password": "bench-password"})
+        login = await client.post("/auth/login", json={"email": "bench@example.com", "password": "bench-password"})
+        login.raise_for_status()
+        token = login.json()["token"]
+
+        tickers = (await client.get(f"/congresstrades/tickers?password={API_PASSWORD}")).json()
+        congressmen = [row[0] for row in (await client.get(f"/congresstrades/congresspeople?password={API_PASSWORD}")).json()]
+        await client.post("/favorites/batch", json={"tickers": tickers[:20]}, headers={"Authorization": f"Bearer {token}"})
+
+        only = set(args.only.split(",")) if args.only else None
+        skip = set(args.skip.split(",")) if args.skip else set()
+        results = {}
+        for index, scenario in enumerate(build_scenarios(tickers, congressmen, args.heavy_requests)):
+            if (only and scenario.name not in only) or scenario.name in skip:
+                continue
+            requests = scenario.requests or args.requests
+            concurrency = min(scenario.concurrency or args.concurrency, requests)
+            results[scenario.name] = await run_scenario(
+                client, scenario, requests, concurrency, token, seed=args.seed + index
+            )
+            r = results[scenario.name]
+            print(f"{scenario.name:32s} p50 {r['p50_ms']:>9} ms  p95 {r['p95_ms']:>9} ms  "
+                  f"p99 {r['p99_ms']:>9} ms  {r['throughput_rps']:>8} req/s  errors {r['errors']}", flush=True)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PelosiBE routes.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--heavy-requests", type=int, default=10, help="requests for full-table scenarios")
+    parser.add_argument("--yf-latency-ms", type=float, default=50)
+    parser.add_argument("--finnhub-latency-ms", type=float, default=80)
+    parser.add_argument("--only", help="comma separated scenario names")
+    parser.add_argument("--skip", help="comma separated scenario names")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True, help="write the JSON results here")
+    args = parser.parse_args()
+
+    finnhub = FakeFinnhub(latency=args.finnhub_latency_ms / 1000)
+    # Both are read at import time by PelosiBE, so set them before importing main.
+    os.environ["FINNHUB_BASE_URL"] = finnhub.start()
+    os.environ.setdefault("FINNHUB_API_KEY", "bench")
+    os.environ["API_PASSWORD"] = API_PASSWORD
+    yf_calls = install_fake_yfinance(latency=args.yf_latency_ms / 1000)
+
+    from main import app
+
+    port = _free_port()
+    server, thread = start_server(app, port)
+    try:
+        results = asyncio.run(drive(f"http://127.0.0.1:{port}", args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+        finnhub.stop()
+
+    with open(args.out, "w") as f:
+        json.dump({"scenarios": results, "upstream_calls": {"yfinance": yf_calls, "finnhub": finnhub.calls}}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
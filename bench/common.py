@@ -0,0 +1,68 @@
+"""
+Shared helpers for the benchmark scripts: paths, database settings and latency summaries.
+"""
+import math
+import os
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+BE_DIR = os.path.join(REPO_ROOT, "PelosiBE")
+DB_DIR = os.path.join(REPO_ROOT, "PelosiDB")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def server_settings():
+    """Connection settings for the local Postgres server that hosts the throwaway database."""
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+        "sslmode": os.getenv("DB_SSLMODE", "disable"),
+    }
+
+
+def service_env(db_name: str, **extra) -> dict:
+    """Environment for a PelosiBE/PelosiDB process pointed at the benchmark database."""
+    settings = server_settings()
+    env = dict(os.environ)
+    env.update({
+        "DB_HOST": settings["host"],
+        "DB_PORT": str(settings["port"]),
+        "DB_USER": settings["user"],
+        "DB_PASSWORD": settings["password"],
+        "DB_SSLMODE": settings["sslmode"],
+        "DB_NAME": db_name,
+    })
+    env.update({k: str(v) for k, v in extra.items()})
+    return env
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    """
+    Args:
+        latencies: per-request durations in seconds
+        errors: requests that failed or returned an unexpected status
+        elapsed: wall-clock seconds for the whole run
+    """
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)) if values else None,
+        "p95_ms": ms(percentile(values, 95)) if values else None,
+        "p99_ms": ms(percentile(values, 99)) if values else None,
+        "max_ms": ms(values[-1]) if values else None,
+    }
@@ -0,0 +1,40 @@
+"""
+Compare two benchmark result files scenario by scenario.
+
+    python bench/compare.py bench/results/<baseline>.json bench/results/<candidate>.json
+"""
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return "     n/a"
+    return f"{(new / old - 1) * 100:+7.1f}%"
+
+
+def main(argv):
+    if len(argv) != 3:
+        print(__doc__.strip())
+        return 2
+    with open(argv[1]) as f:
+        baseline = json.load(f)
+    with open(argv[2]) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline.get('commit')} {baseline.get('started_at')} {baseline.get('label') or ''}")
+    print(f"candidate {candidate.get('commit')} {candidate.get('started_at')} {candidate.get('label') or ''}")
+    print(f"{'scenario':32s}" + "".join(f"{m:>24s}" for m in METRICS))
+    for name, new in candidate["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        cells = "".join(f"{str(new.get(m)):>14s} {_change(old.get(m), new.get(m))}" for m in METRICS)
+        print(f"{name:32s}{cells}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
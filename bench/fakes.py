@@ -0,0 +1,144 @@
+"""
+Local stand-ins for the upstreams PelosiBE calls, with configurable latency.
+
+- Finnhub: a threaded HTTP server on 127.0.0.1; point FINNHUB_BASE_URL at it.
+- yfinance: yf.Ticker and yf.download are patched in-process with synthetic,
+  deterministic price frames, so refreshes never leave the machine.
+"""
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Real symbols only have history since listing; keeps FULL_HISTORY_START refreshes bounded.
+FAKE_LISTING_YEARS = 5
+
+
+class FakeFinnhub:
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+        self._server = None
+
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.calls += 1
+                time.sleep(fake.latency)
+                url = urlparse(self.path)
+                symbol = parse_qs(url.query).get("symbol", ["?"])[0]
+                if url.path.endswith("/stock/recommendation"):
+                    body = _recommendations(symbol)
+                elif url.path.endswith("/company-news"):
+                    body = _news(symbol)
+                else:
+                    self.send_error(404)
+                    return
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _recommendations(symbol: str):
+    today = date.today().replace(day=1)
+    return [
+        {"symbol": symbol, "period": (today - timedelta(days=30 * i)).isoformat(),
+         "strongBuy": 8 + i, "buy": 14, "hold": 9 - i, "sell": 2, "strongSell": 1}
+        for i in range(4)
+    ]
+
+
+def _news(symbol: str):
+    now = int(time.time())
+    return [
+        {"category": "company", "datetime": now - 3600 * i, "headline": f"{symbol} headline {i}",
+         "id": i, "related": symbol, "source": "bench", "summary": "Synthetic article. " * 10,
+         "url": f"https://example.com/{symbol}/{i}"}
+        for i in range(20)
+    ]
+
+
+def synthetic_history(ticker: str, start, end) -> pd.DataFrame:
+    """Business-day OHLCV frame shaped like yfinance's history(), reproducible per ticker."""
+    listed = pd.Timestamp(date.today() - timedelta(days=365 * FAKE_LISTING_YEARS))
+    start = max(pd.Timestamp(start), listed)
+    days = pd.bdate_range(start, pd.Timestamp(end), inclusive="left", name="Date")
+    if days.empty:
+        return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"], index=days)
+
+    # The walk is seeded by ticker and anchored at the listing date, so overlapping
+    # windows of the same ticker agree on every bar.
+    rng = np.random.default_rng(zlib.crc32(ticker.encode("utf-8")))
+    offset = len(pd.bdate_range(listed, days[0], inclusive="left"))
+    steps = rng.normal(0, 0.02, offset + len(days))[offset:]
+    base = 20 + 180 * zlib.crc32(ticker.encode("utf-8")) / 2 ** 32
+    closes = base * np.exp(np.cumsum(steps))
+    spread = closes * 0.01
+    return pd.DataFrame(
+        {
+            "Open": closes - spread / 2,
+            "High": closes + spread,
+            "Low": closes - spread,
+            "Close": closes,
+            "Volume": np.full(len(days), 1_000_000, dtype="int64"),
+        },
+        index=days,
+    )
+
+
+def install_fake_yfinance(latency: float = 0.05):
+    """Patch the yfinance module in place; returns a dict of call counters."""
+    import yfinance
+
+    calls = {"info": 0, "history": 0, "download": 0}
+
+    class FakeTicker:
+        def __init__(self, ticker, session=None):
+            self.ticker = ticker.upper()
+
+        @property
+        def info(self):
+            calls["info"] += 1
+            time.sleep(latency)
+            return {"longName": f"{self.ticker} Holdings Inc"}
+
+        def history(self, start=None, end=None, **kwargs):
+            calls["history"] += 1
+            time.sleep(latency)
+            return synthetic_history(self.ticker, start, end or date.today())
+
+    def fake_download(tickers, start=None, end=None, **kwargs):
+        calls["download"] += 1
+        time.sleep(latency)
+        symbols = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {symbol: synthetic_history(symbol, start, end or date.today()) for symbol in symbols}
+        # group_by="ticker" layout: (ticker, field) column MultiIndex
+        return pd.concat(frames, axis=1)
+
+    yfinance.Ticker = FakeTicker
+    yfinance.download = fake_download
+    return calls
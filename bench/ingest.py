@@ -0,0 +1,101 @@
+"""
+Benchmark for PelosiDB's save_data_grouped ingest.
+
+Started by run.py with PYTHONPATH=PelosiDB. Feeds synthetic scraped rows, in
+the table layout scrape_congress_trades returns, through three passes:
+
+    new        every row unseen
+    duplicate  the same rows again (the daily case: the table barely changes)
+    mixed      mostly repeats with a slice of new rows
+
+Ingest runs one batch at a time in production (the scheduler never overlaps
+it), so each pass is timed sequentially over --repeat batches.
+"""
+import argparse
+from datetime import date, timedelta
+import json
+import random
+import sys
+import time
+
+from common import summarize
+from seed import AMOUNT_RANGES, TRANSACTION_TYPES, make_tickers
+
+
+def scraped_rows(count: int, rng: random.Random, congressmen: int, tickers):
+    rows = []
+    today = date.today()
+    for _ in range(count):
+        ticker = rng.choice(tickers)
+        traded = today - timedelta(days=rng.randrange(3650))
+        filed = traded + timedelta(days=rng.randrange(1, 45))
+        member = rng.randrange(congressmen)
+        rows.append([
+            f"{ticker}\n{ticker} HOLDINGS, INC. - COMMON STOCK\nST",
+            f"{rng.choice(TRANSACTION_TYPES)}\n{rng.choice(AMOUNT_RANGES)}",
+            f"Member {member:05d}\n{'Senate' if member % 5 == 0 else 'House'} / {'DRI'[member % 3]}",
+            filed.strftime("%b. %d, %Y"),
+            traded.strftime("%b. %d, %Y"),
+            f"{rng.randrange(1, 90)} days",
+            f"{rng.uniform(-50, 150):.2f}%",
+        ])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark save_data_grouped.")
+    parser.add_argument("--rows", type=int, default=2000, help="rows per scraped batch")
+    parser.add_argument("--repeat", type=int, default=5, help="batches per pass")
+    parser.add_argument("--congressmen", type=int, default=535)
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--new-fraction", type=float, default=0.05, help="share of new rows in the mixed pass")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    from utils.db import init_db
+    from utils.db_io import save_data_grouped
+
+    init_db()
+    rng = random.Random(args.seed)
+    tickers = make_tickers(args.tickers)
+    batches = [scraped_rows(args.rows, rng, args.congressmen, tickers) for _ in range(args.repeat)]
+    fresh = max(1, int(args.rows * args.new_fraction))
+    passes = {
+        "new": batches,
+        "duplicate": batches,
+        "mixed": [batch[fresh:] + scraped_rows(fresh, rng, args.congressmen, tickers) for batch in batches],
+    }
+
+    results = {}
+    for name, pass_batches in passes.items():
+        latencies, errors, summaries = [], 0, []
+        started = time.perf_counter()
+        for batch in pass_batches:
+            batch_started = time.perf_counter()
+            try:
+                summary = save_data_grouped(batch)
+            except Exception as e:
+                print(f"ingest {name} failed: {e}", file=sys.stderr)
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - batch_started)
+            summaries.append({k: v for k, v in summary.items() if k != "rejected"})
+        elapsed = time.perf_counter() - started
+        result = summarize(latencies, errors, elapsed)
+        result.update(
+            rows_per_batch=args.rows,
+            rows_per_second=round(args.rows * len(latencies) / elapsed, 1) if elapsed else 0.0,
+            batches=summaries,
+        )
+        results[f"ingest_{name}"] = result
+        print(f"ingest_{name:26s} p50 {result['p50_ms']:>9} ms  p95 {result['p95_ms']:>9} ms  "
+              f"{result['rows_per_second']:>9} rows/s  errors {errors}", flush=True)
+
+    with open(args.out, "w") as f:
+        json.dump({"scenarios": results}, f, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Offline benchmark for PelosiBE routes and the PelosiDB ingest.
+
+Creates a throwaway database on a local Postgres server, seeds it with a
+synthetic congressional-trade dataset, runs api.py (every PelosiBE route,
+with fake yfinance/Finnhub) and ingest.py (save_data_grouped) in their own
+processes, and writes one JSON result file per run to bench/results/.
+
+    # Postgres reachable with DB_HOST/DB_PORT/DB_USER/DB_PASSWORD (defaults: localhost:5432 postgres/postgres)
+    python bench/run.py --transactions 100000 --concurrency 16
+    python bench/run.py --transactions 5000000 --tickers 8000 --skip fetch_all
+    python bench/compare.py bench/results/<old>.json bench/results/<new>.json
+
+The two services share a `utils` package name, so each side runs in a separate
+interpreter with its own PYTHONPATH.
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BE_DIR, DB_DIR, REPO_ROOT, RESULTS_DIR, service_env
+import seed
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run_child(script: str, pythonpath: str, env: dict, cwd: str, args):
+    out = os.path.join(cwd, f"{script}.json")
+    child_env = dict(env, PYTHONPATH=os.pathsep.join(filter(None, [pythonpath, env.get("PYTHONPATH")])))
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{script}.py"), "--out", out, *args]
+    subprocess.run(cmd, env=child_env, cwd=cwd, check=True)
+    with open(out) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a throwaway database and benchmark PelosiBE/PelosiDB.")
+    parser.add_argument("--transactions", type=int, default=10_000, help="synthetic transactions (10k to 5M)")
+    parser.add_argument("--congressmen", type=int, default=535)
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--price-tickers", type=int, default=300, help="tickers with stored price history")
+    parser.add_argument("--price-years", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route scenario")
+    parser.add_argument("--heavy-requests", type=int, default=10, help="requests for full-table scenarios")
+    parser.add_argument("--yf-latency-ms", type=float, default=50)
+    parser.add_argument("--finnhub-latency-ms", type=float, default=80)
+    parser.add_argument("--ingest-rows", type=int, default=2000)
+    parser.add_argument("--ingest-repeat", type=int, default=5)
+    parser.add_argument("--only", help="comma separated API scenario names")
+    parser.add_argument("--skip", help="comma separated API scenario names (e.g. fetch_all)")
+    parser.add_argument("--no-api", action="store_true")
+    parser.add_argument("--no-ingest", action="store_true")
+    parser.add_argument("--db-name", default=f"pelosi_bench_{os.getpid()}")
+    parser.add_argument("--admin-db", default="postgres", help="database used to create/drop the throwaway one")
+    parser.add_argument("--keep-db", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", help="free-form tag stored with the results")
+    args = parser.parse_args()
+
+    started_at = datetime.now()
+    env = service_env(args.db_name)
+    report = {
+        "label": args.label,
+        "commit": _git_commit(),
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "params": {k: v for k, v in vars(args).items() if k not in ("label",)},
+        "scenarios": {},
+    }
+
+    seed.create_database(args.db_name, args.admin_db)
+    try:
+        conn = seed.connect(args.db_name)
+        seed_started = time.perf_counter()
+        report["dataset"] = seed.seed(
+            conn, args.transactions, args.congressmen, args.tickers,
+            args.price_tickers, args.price_years, args.seed,
+        )
+        report["dataset"]["seed_seconds"] = round(time.perf_counter() - seed_started, 2)
+        conn.close()
+        print(f"Seeded {args.db_name}: {report['dataset']}", flush=True)
+
+        # fetch-all writes data/ under the working directory; keep it out of the repo.
+        with tempfile.TemporaryDirectory(prefix="pelosi-bench-") as workdir:
+            if not args.no_api:
+                api_args = [
+                    "--concurrency", str(args.concurrency), "--requests", str(args.requests),
+                    "--heavy-requests", str(args.heavy_requests), "--seed", str(args.seed),
+                    "--yf-latency-ms", str(args.yf_latency_ms), "--finnhub-latency-ms", str(args.finnhub_latency_ms),
+                ]
+                if args.only:
+                    api_args += ["--only", args.only]
+                if args.skip:
+                    api_args += ["--skip", args.skip]
+                api = _run_child("api", BE_DIR, env, workdir, api_args)
+                report["scenarios"].update(api["scenarios"])
+                report["upstream_calls"] = api["upstream_calls"]
+
+            if not args.no_ingest:
+                ingest = _run_child("ingest", DB_DIR, env, workdir, [
+                    "--rows", str(args.ingest_rows), "--repeat", str(args.ingest_repeat),
+                    "--congressmen", str(args.congressmen), "--tickers", str(args.tickers), "--seed", str(args.seed),
+                ])
+                report["scenarios"].update(ingest["scenarios"])
+    finally:
+        if not args.keep_db:
+            seed.drop_database(args.db_name, args.admin_db)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    name = f"{started_at.strftime('%Y%m%dT%H%M%S')}_{report['commit'] or 'nocommit'}.json"
+    path = os.path.join(RESULTS_DIR, name)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
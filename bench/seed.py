@@ -0,0 +1,202 @@
+"""
+Throwaway benchmark database: create, migrate, fill with synthetic data, drop.
+
+Everything is loaded with COPY from generated text, so 5M transactions seed in
+minutes rather than hours. The same seed always produces the same dataset.
+"""
+from datetime import date, timedelta
+import importlib.util
+import io
+import logging
+import os
+import string
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+
+from common import BE_DIR, server_settings
+
+AMOUNT_RANGES = [
+    "$1,001 - $15,000",
+    "$15,001 - $50,000",
+    "$50,001 - $100,000",
+    "$100,001 - $250,000",
+    "$250,001 - $500,000",
+    "$500,001 - $1,000,000",
+    "$1,000,001 - $5,000,000",
+    "$5,000,001 - $25,000,000",
+    "$25,000,001 - $50,000,000",
+]
+TRANSACTION_TYPES = ["Purchase", "Sale"]
+PARTIES = ["D", "R", "I"]
+TRADE_HISTORY_DAYS = 10 * 365
+COPY_CHUNK_ROWS = 200_000
+
+
+def _load_migrations():
+    # Loaded by path: bench scripts must not import either service's `utils` package.
+    spec = importlib.util.spec_from_file_location("pelosi_migrations", os.path.join(BE_DIR, "utils", "migrations.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def connect(db_name: str):
+    return psycopg2.connect(database=db_name, **server_settings())
+
+
+def create_database(db_name: str, admin_db: str = "postgres"):
+    conn = connect(admin_db)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP DATABASE IF EXISTS {};").format(sql.Identifier(db_name)))
+        cur.execute(sql.SQL("CREATE DATABASE {};").format(sql.Identifier(db_name)))
+    conn.close()
+
+
+def drop_database(db_name: str, admin_db: str = "postgres"):
+    conn = connect(admin_db)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE);").format(sql.Identifier(db_name)))
+    conn.close()
+
+
+def make_tickers(count: int):
+    """Distinct 1-4 letter symbols: A..Z, AA..ZZ, ..."""
+    letters = string.ascii_uppercase
+    tickers = []
+    length = 1
+    while len(tickers) < count:
+        for index in range(len(letters) ** length):
+            symbol = ""
+            for _ in range(length):
+                index, digit = divmod(index, len(letters))
+                symbol = letters[digit] + symbol
+            tickers.append(symbol)
+            if len(tickers) == count:
+                break
+        length += 1
+    return tickers
+
+
+def _copy(cur, table: str, columns, lines):
+    buffer = io.StringIO("\n".join(lines) + "\n")
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)", buffer)
+
+
+def _transactions(rng, count: int, congressmen: int, stocks: int):
+    """Unique (congressman, stock, date, amount, type) tuples, deduplicated as packed int64 keys."""
+    days = TRADE_HISTORY_DAYS
+    amounts, types = len(AMOUNT_RANGES), len(TRANSACTION_TYPES)
+    # A few popular stocks take most of the trades, like the real data
+    stock_ids = np.minimum(rng.zipf(1.3, count) - 1, stocks - 1)
+    rng.shuffle(stock_ids)
+    keys = (
+        (((rng.integers(0, congressmen, count) * stocks + stock_ids) * days
+          + rng.integers(0, days, count)) * amounts
+         + rng.integers(0, amounts, count)) * types
+        + rng.integers(0, types, count)
+    )
+    keys = np.unique(keys)
+    keys, type_idx = np.divmod(keys, types)
+    keys, amount_idx = np.divmod(keys, amounts)
+    keys, day_idx = np.divmod(keys, days)
+    congressman_idx, stock_idx = np.divmod(keys, stocks)
+    return congressman_idx, stock_idx, day_idx, amount_idx, type_idx
+
+
+def seed(
+    conn,
+    transactions: int,
+    congressmen: int = 535,
+    tickers: int = 2000,
+    price_tickers: int = 300,
+    price_years: int = 3,
+    seed_value: int = 42,
+):
+    """
+    Migrate and fill the database; returns the row counts actually written.
+
+    Transaction keys collide occasionally and are dropped, so the transaction
+    count can come out slightly below the requested one.
+    """
+    migrations = _load_migrations()
+    migrations.migrate(conn)
+    rng = np.random.default_rng(seed_value)
+    symbols = make_tickers(tickers)
+    today = date.today()
+    counts = {}
+
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE trades_raw, congressmen, stocks, transactions, users, favorite_stocks, "
+                    "price_history, price_history_coverage, transaction_returns RESTART IDENTITY CASCADE;")
+
+        _copy(cur, "congressmen", ("name", "chamber", "party"), (
+            f"Member {i:05d}\t{'Senate' if i % 5 == 0 else 'House'}\t{PARTIES[i % len(PARTIES)]}"
+            for i in range(congressmen)
+        ))
+        _copy(cur, "stocks", ("ticker", "name", "company_name"), (
+            f"{symbol}\t{symbol} HOLDINGS\t{symbol} HOLDINGS, INC. - COMMON STOCK" for symbol in symbols
+        ))
+        counts.update(congressmen=congressmen, stocks=tickers)
+
+        congressman_idx, stock_idx, day_idx, amount_idx, type_idx = _transactions(rng, transactions, congressmen, tickers)
+        first_day = today - timedelta(days=TRADE_HISTORY_DAYS)
+        dates = (np.datetime64(first_day) + day_idx.astype("timedelta64[D]")).astype(str)
+        total = len(congressman_idx)
+        for start in range(0, total, COPY_CHUNK_ROWS):
+            end = min(start + COPY_CHUNK_ROWS, total)
+            # SERIAL ids follow insertion order: congressmen and stocks are 1-based
+            _copy(cur, "transactions", ("congressman_id", "stock_id", "transaction_type", "transaction_date", "amount_range"), (
+                f"{c + 1}\t{s + 1}\t{TRANSACTION_TYPES[t]}\t{d}\t{AMOUNT_RANGES[a]}"
+                for c, s, t, d, a in zip(
+                    congressman_idx[start:end].tolist(),
+                    stock_idx[start:end].tolist(),
+                    type_idx[start:end].tolist(),
+                    dates[start:end].tolist(),
+                    amount_idx[start:end].tolist(),
+                )
+            ))
+        counts["transactions"] = total
+
+        # Stored prices for the most traded stocks; the rest go through the fake yfinance.
+        price_days = np.busday_offset(np.datetime64(today), -252 * price_years, roll="forward")
+        trading_days = np.arange(price_days, np.datetime64(today), dtype="datetime64[D]")
+        trading_days = trading_days[np.is_busday(trading_days)]
+        day_strings = trading_days.astype(str).tolist()
+        popular = np.bincount(stock_idx, minlength=tickers).argsort()[::-1][:price_tickers]
+        bars = 0
+        for s in popular.tolist():
+            closes = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0, 0.02, len(day_strings))))
+            spread = closes * rng.uniform(0, 0.02, len(day_strings))
+            volumes = rng.integers(10_000, 5_000_000, len(day_strings))
+            _copy(cur, "price_history", ("ticker", "date", "open", "high", "low", "close", "volume"), (
+                f"{symbols[s]}\t{d}\t{c - w / 2:.4f}\t{c + w:.4f}\t{c - w:.4f}\t{c:.4f}\t{v}"
+                for d, c, w, v in zip(day_strings, closes.tolist(), spread.tolist(), volumes.tolist())
+            ))
+            bars += len(day_strings)
+        _copy(cur, "price_history_coverage", ("ticker", "company_name", "covered_start", "covered_end"), (
+            f"{symbols[s]}\t{symbols[s]} Holdings Inc\t{day_strings[0]}\t{today.isoformat()}" for s in popular.tolist()
+        ))
+        counts.update(price_tickers=len(popular), price_bars=bars)
+
+        cur.execute("REFRESH MATERIALIZED VIEW latest_transactions;")
+        # Returns for the latest trades, as the returns stage would have stored them
+        cur.execute("""
+            INSERT INTO transaction_returns (transaction_id, ticker, trade_price_date, latest_date, return_pct)
+            SELECT t.id, s.ticker, t.transaction_date, CURRENT_DATE, round((random() * 120 - 40)::numeric, 2)
+            FROM latest_transactions t
+            JOIN stocks s ON s.id = t.stock_id;
+        """)
+        counts["transaction_returns"] = cur.rowcount
+    conn.commit()
+
+    # ANALYZE cannot run inside a transaction block
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE;")
+    conn.autocommit = False
+    logging.info(f"Seeded benchmark database: {counts}")
+    return counts